@@ -1,3 +1,75 @@
+import os
+import numpy as np
+
+# keys required in states, control, and measurements dictionaries
+_REQUIRED_VARIABLE_KEYS = ("order", "lb", "ub")
+
+# maximum number of validated spec fingerprints remembered between instantiations
+_MAX_VALIDATED_SPECS = 32
+_validated_specs = set()
+
+
+def _variable_arrays(variables, fill):
+    """
+    Returns a copy of a states, control, or measurements dictionary with 'order' as a
+    tuple and 'lb'/'ub' as float64 numpy.ndarray (None bounds become -inf/inf)
+
+    Parameters
+    ----------
+    variables : dict
+        states, control, or measurements dictionary
+    fill : dict
+        values used for None entries, keyed on 'lb' and 'ub'
+
+    Returns
+    -------
+    converted : dict
+        converted copy of variables
+
+    """
+
+    converted = dict(variables)
+    converted["order"] = tuple(variables["order"])
+    for key in ("lb", "ub"):
+        converted[key] = np.array(
+            [fill[key] if val is None else val for val in variables[key]],
+            dtype=np.float64,
+        )
+
+    return converted
+
+
+def _spec_fingerprint(value):
+    """
+    Returns a hashable summary of a spec value containing everything the validation
+    depends on: container types, dictionary keys, list lengths, and string values.
+
+    Parameters
+    ----------
+    value : object
+        spec value to summarize
+
+    Returns
+    -------
+    fingerprint : tuple
+        hashable summary of value
+
+    """
+
+    if isinstance(value, dict):
+        return (
+            dict,
+            tuple((key, _spec_fingerprint(val)) for key, val in value.items()),
+        )
+    if isinstance(value, tuple):
+        return (tuple, tuple(_spec_fingerprint(val) for val in value))
+    if isinstance(value, list):
+        return (list, len(value))
+    if isinstance(value, str):
+        return (str, value)
+    return (type(value),)
+
+
 class Optimization(object):
     """
     MPC dispatch optimization.
@@ -7,6 +79,9 @@ class Optimization(object):
     The return_next_dispatch method for this class returns the initial values for states,
     zeros for controls, and nothing for measurements.
 
+    Input dictionaries are validated once per spec shape; setting the environment
+    variable ORCA_SKIP_VALIDATION skips validation entirely.
+
     Parameters
     ----------
     t_window : float
@@ -29,21 +104,38 @@ class Optimization(object):
     n : int
         number of steps to take in time horizon
     states : dict
-        dictionary of information about state variables
+        dictionary of information about state variables ('order' tuple, 'lb' and 'ub' numpy.ndarray)
     control : dict
-        dictionary of information about control variables
+        dictionary of information about control variables ('order' tuple, 'lb' and 'ub' numpy.ndarray)
     measurements : dict or None, optional
-        dictionary of information about measurement variables
+        dictionary of information about measurement variables ('order' tuple, 'lb' and 'ub' numpy.ndarray)
 
     Methods
     -------
+    validate_specs(states, control, measurements, objective)
+        checks that states, control, measurements, and objective dictionaries are properly inputted
     check_states_control_measurements_dicts(name, test_dict)
         checks that states, control, and measurement dictionaries are properly inputted
+    evaluate_objective(rewards, states, control, measurements)
+        returns the objective function value of state, control, and measurement trajectories
     return_next_dispatch(rewards, x_init)
         returns state, control, and measurement information at optimal dispatch
 
     """
 
+    __slots__ = (
+        "t_window",
+        "dt",
+        "n",
+        "states",
+        "control",
+        "measurements",
+        "objective",
+        "_zero_control",
+        "_zero_measurements",
+        "_multipliers",
+    )
+
     def __init__(
         self,
         t_window=60.0 * 12.0,
@@ -61,15 +153,77 @@ class Optimization(object):
         self.dt = dt
         self.n = int(self.t_window / self.dt)
 
+        # ensure states, control, measurements, and objective have everything needed,
+        # only validating spec shapes that have not already passed (the checks are
+        # asserts, so nothing is done when running with python -O)
+        if __debug__ and not os.environ.get("ORCA_SKIP_VALIDATION"):
+            fingerprint = (
+                type(self),
+                _spec_fingerprint((states, control, measurements, objective)),
+            )
+            if fingerprint not in _validated_specs:
+                self.validate_specs(states, control, measurements, objective)
+                if len(_validated_specs) >= _MAX_VALIDATED_SPECS:
+                    _validated_specs.clear()
+                _validated_specs.add(fingerprint)
+        # store bounds as float64 arrays (copies, inputs are left unmodified)
+        fill = {"lb": -np.inf, "ub": np.inf}
+        self.states = _variable_arrays(states, fill)
+        self.control = _variable_arrays(control, fill)
+        if measurements is not None:
+            self.measurements = _variable_arrays(measurements, fill)
+        else:
+            self.measurements = None
+        self.objective = objective
+
+        # zero control and measurement values returned by return_next_dispatch
+        self._zero_control = [0.0] * len(control["order"])
+        if measurements is not None:
+            self._zero_measurements = [0.0] * len(measurements["order"])
+        else:
+            self._zero_measurements = []
+
+        # objective multipliers as float64 arrays, keyed on reward/price name
+        self._multipliers = {}
+        for key, spec in objective.items():
+            if key == "sense":
+                continue
+            measurement_multiplier = spec.get("measurement_multiplier")
+            if measurement_multiplier is not None:
+                measurement_multiplier = np.ascontiguousarray(
+                    measurement_multiplier, dtype=np.float64
+                )
+            self._multipliers[key] = (
+                np.ascontiguousarray(spec["state_multiplier"], dtype=np.float64),
+                np.ascontiguousarray(spec["control_multiplier"], dtype=np.float64),
+                measurement_multiplier,
+            )
+
+    def validate_specs(self, states, control, measurements, objective):
+        """
+        Checks that states, control, measurements, and objective dictionaries
+        are properly inputted
+
+        Parameters
+        ----------
+        states : dict
+            dictionary of information about state variables
+        control : dict
+            dictionary of information about control variables
+        measurements : dict or None
+            dictionary of information about measurement variables
+        objective : dict
+            dictionary of information about the objective function
+
+        """
+
         # ensure states input dictionary has everything needed
         assert isinstance(states, dict), "states must be dictionary."
         self.check_states_control_measurements_dicts("states", states)
-        self.states = states
 
         # ensure control input dictionary has everything needed
         assert isinstance(control, dict), "control must be dictionary."
         self.check_states_control_measurements_dicts("control", control)
-        self.control = control
 
         # ensure optional measurements dictionary has everything needed
         if measurements is not None:
@@ -77,7 +231,6 @@ class Optimization(object):
                 measurements, dict
             ), "measurements must be dictionary or None."
             self.check_states_control_measurements_dicts("measurements", measurements)
-        self.measurements = measurements
 
         # ensure objective dictionary has everything needed
         assert isinstance(objective, dict), "objective must be dictionary."
@@ -86,41 +239,43 @@ class Optimization(object):
             "maximize",
             "minimize",
         ], "'sense' must be either 'maximize' or 'minimize'"
-        objective_keys = list(objective.keys())
-        objective_keys.remove("sense")
-        for key in objective_keys:
+        n_states = len(states["order"])
+        n_control = len(control["order"])
+        for key, spec in objective.items():
+            if key == "sense":
+                continue
             # take care of state information
             assert (
-                "state_multiplier" in objective[key]
+                "state_multiplier" in spec
             ), f"'state_multiplier' list must be in {key} for objective dictionary."
             assert isinstance(
-                objective[key]["state_multiplier"], list
+                spec["state_multiplier"], list
             ), f"'state_multiplier' in {key} for objective dictionary must be list."
-            assert len(objective[key]["state_multiplier"]) == len(
-                self.states["order"]
+            assert (
+                len(spec["state_multiplier"]) == n_states
             ), f"number of states in {key} for objective dictionary must be same as in states dictionary."
             # take care of control information
             assert (
-                "control_multiplier" in objective[key]
+                "control_multiplier" in spec
             ), f"'control_multiplier' list must be in {key} for objective dictionary."
             assert isinstance(
-                objective[key]["control_multiplier"], list
+                spec["control_multiplier"], list
             ), f"'control_multiplier' in {key} for objective dictionary must be list."
-            assert len(objective[key]["control_multiplier"]) == len(
-                self.control["order"]
+            assert (
+                len(spec["control_multiplier"]) == n_control
             ), f"number of control variables in {key} for objective dictionary must be same as in control dictionary."
             # take care of measurement information (optional)
-            if "measurement_multiplier" in objective[key]:
+            measurement_multiplier = spec.get("measurement_multiplier")
+            if measurement_multiplier is not None:
                 assert isinstance(
-                    objective[key]["measurement_multiplier"], list
+                    measurement_multiplier, list
                 ), f"'measurement_multiplier' in {key} for objective dictionary must be list."
                 assert isinstance(
-                    self.measurements, dict
+                    measurements, dict
                 ), f"to use 'measurement_multiplier' in {key} for objective dictionary, measurement dictionary must be defined."
-                assert len(objective[key]["measurement_multiplier"]) == len(
-                    self.measurements["order"]
+                assert len(measurement_multiplier) == len(
+                    measurements["order"]
                 ), f"number of measurement variables in {key} for objective dictionary must be same as in measurement dictionary."
-        self.objective = objective
 
     def check_states_control_measurements_dicts(self, name, test_dict):
         """
@@ -135,14 +290,71 @@ class Optimization(object):
             dictionary to test
 
         """
-        # required keys
-        req_keys = ["order", "lb", "ub"]
-        lens = []
-        for key in req_keys:
+        for key in _REQUIRED_VARIABLE_KEYS:
             assert key in test_dict, f"{key} missing from {name} dictionary."
             assert isinstance(test_dict[key], list), f"{key} in {name} must be list."
-            lens.append(len(test_dict[key]))
-        assert all(lens), f"all lists in {name} must have same length."
+        first = len(test_dict[_REQUIRED_VARIABLE_KEYS[0]])
+        assert all(
+            len(test_dict[key]) == first for key in _REQUIRED_VARIABLE_KEYS[1:]
+        ), f"all lists in {name} must have same length."
+
+    def evaluate_objective(self, rewards, states, control, measurements=None):
+        """
+        Returns the objective function value of trajectories over the time horizon,
+        e.g. to estimate the cost of a warm-start guess
+
+        sum_{i,t} P[i,t]*(state_multiplier.x_t + control_multiplier.u_t + measurement_multiplier.y_t)
+
+        Parameters
+        ----------
+        rewards : dict
+            dictionary keys are names of reward/price, values are numpy.ndarray or list of n reward/price samples
+        states : numpy.ndarray
+            state values with shape (number of states, n)
+        control : numpy.ndarray
+            control values with shape (number of control variables, n)
+        measurements : numpy.ndarray or None, optional
+            measurement values with shape (number of measurement variables, n)
+
+        Returns
+        -------
+        value : float
+            objective function value
+
+        """
+
+        states = np.asarray(states, dtype=np.float64)
+        control = np.asarray(control, dtype=np.float64)
+        assert states.shape == (
+            len(self.states["order"]),
+            self.n,
+        ), "states must have shape (number of states, n)."
+        assert control.shape == (
+            len(self.control["order"]),
+            self.n,
+        ), "control must have shape (number of control variables, n)."
+        if measurements is not None:
+            measurements = np.asarray(measurements, dtype=np.float64)
+            assert (
+                self.measurements is not None
+            ), "measurements given but no measurements were specified."
+            assert measurements.shape == (
+                len(self.measurements["order"]),
+                self.n,
+            ), "measurements must have shape (number of measurement variables, n)."
+
+        value = 0.0
+        for key, (state_mul, control_mul, meas_mul) in self._multipliers.items():
+            # weighted sum of variables at each time step
+            kernel = state_mul @ states + control_mul @ control
+            if meas_mul is not None:
+                assert (
+                    measurements is not None
+                ), f"measurements required by measurement_multiplier of {key}."
+                kernel += meas_mul @ measurements
+            value += np.dot(np.asarray(rewards[key], dtype=np.float64), kernel)
+
+        return float(value)
 
     def return_next_dispatch(self, rewards, x_init):
         """
@@ -163,16 +375,10 @@ class Optimization(object):
         """
 
         # return values of states, control, measurements
-        result = {"states": [], "control": [], "measurements": []}
-        # states
-        for i in range(len(x_init)):
-            result["states"].append(x_init[i])
-        # control
-        for i in range(len(self.control["order"])):
-            result["control"].append(0.0)
-        # measurements
-        if self.measurements is not None:
-            for i in range(len(self.measurements["order"])):
-                result["measurements"].append(0.0)
+        result = {
+            "states": list(x_init),
+            "control": self._zero_control.copy(),
+            "measurements": self._zero_measurements.copy(),
+        }
 
         return result
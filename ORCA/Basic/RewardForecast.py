@@ -29,9 +29,13 @@ class RewardForecast(object):
     -------
     gen_reward()
         generates n reward/price values to use in MPC time horizon optimization
+    gen_reward_into(out)
+        generates n reward/price values and writes them into a preallocated array
 
     """
 
+    __slots__ = ("t_window", "dt", "n", "i", "_reward")
+
     def __init__(self, t_window=60.0 * 12.0, dt=5.0, **specs):
         # get time window, time step, and number of steps to take
         assert isinstance(t_window, float), "t_window must be float."
@@ -40,6 +44,8 @@ class RewardForecast(object):
         self.dt = dt
         self.n = int(self.t_window / self.dt)
         self.i = 0
+        # constant reward/price returned by gen_reward
+        self._reward = np.full(self.n, 10.0)
 
     def gen_reward(self):
         """
@@ -54,4 +60,20 @@ class RewardForecast(object):
 
         self.i += 1
 
-        return np.array([10.0] * self.n)
+        return self._reward.copy()
+
+    def gen_reward_into(self, out):
+        """
+        Generates reward/price data for n steps in time horizon and writes it into
+        the preallocated array out
+
+        Subclasses may override this to avoid allocating a new array on every call.
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+            array of length n that receives the reward/price data
+
+        """
+
+        out[:] = self.gen_reward()
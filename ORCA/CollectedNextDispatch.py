@@ -1,9 +1,75 @@
+import copy
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
 import importlib
 import os
 import yaml
-from yaml import Loader
+import numpy as np
 import pandas as pd
 
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    # libyaml C extension not available
+    from yaml import SafeLoader as Loader
+
+
+@functools.lru_cache(maxsize=64)
+def _load_spec(spec_path, mtime_ns, size):
+    """
+    Parses a YAML spec file. Results are cached on the resolved path, modification
+    time, and size so that repeated instantiation from an unchanged file skips parsing.
+
+    Parameters
+    ----------
+    spec_path : str
+        resolved (os.path.realpath) path to YAML spec file
+    mtime_ns : int
+        modification time of spec_path in nanoseconds (part of the cache key)
+    size : int
+        size of spec_path in bytes (part of the cache key)
+
+    Returns
+    -------
+    specs : dict
+        parsed specifications (shared by the cache, must not be mutated)
+
+    """
+
+    try:
+        with open(spec_path, "r") as f:
+            return yaml.load(f, Loader=Loader)
+    except yaml.YAMLError as exc:
+        raise ValueError(f"{spec_path} spec file could not be parsed: ", exc)
+
+
+def _read_spec(spec_path):
+    """
+    Returns the parsed YAML spec file from the cache, keyed on the resolved path so
+    relative paths opened from different working directories do not share an entry.
+
+    Parameters
+    ----------
+    spec_path : str
+        path to YAML spec file
+
+    Returns
+    -------
+    specs : dict
+        parsed specifications (shared by the cache, must not be mutated)
+
+    """
+
+    spec_path = os.path.realpath(spec_path)
+    stat = os.stat(spec_path)
+
+    return _load_spec(spec_path, stat.st_mtime_ns, stat.st_size)
+
+
+# Optimization and RewardForecast classes already looked up, keyed on (object_type, type)
+_class_cache = {}
+
 
 def instantiate_optimization_or_reward_object(specs, object_type):
     """
@@ -23,25 +89,179 @@ def instantiate_optimization_or_reward_object(specs, object_type):
 
     """
 
-    if object_type == specs["type"]:
-        # requested basic version of object
-        module_name = "ORCA.Basic." + object_type
-    elif object_type == "Optimization":
-        module_name = "ORCA.Optimization." + specs["type"]
-    else:
-        # object_type is "RewardForecast"
-        module_name = "ORCA.RewardForecast." + specs["type"]
+    key = (object_type, specs["type"])
+    cls = _class_cache.get(key)
+    if cls is None:
+        if object_type == specs["type"]:
+            # requested basic version of object
+            module_name = "ORCA.Basic." + object_type
+        elif object_type == "Optimization":
+            module_name = "ORCA.Optimization." + specs["type"]
+        else:
+            # object_type is "RewardForecast"
+            module_name = "ORCA.RewardForecast." + specs["type"]
+
+        try:
+            module = importlib.import_module(module_name)
+        except ModuleNotFoundError:
+            raise ImportError(f"Requested {object_type} {specs['type']} not found!")
 
-    try:
-        module = importlib.import_module(module_name)
-    except ModuleNotFoundError:
-        raise ImportError(f"Requested {object_type} {specs['type']} not found!")
+        cls = getattr(module, specs["type"])
+        _class_cache[key] = cls
 
-    obj = getattr(module, specs["type"])(**specs)
+    obj = cls(**specs)
 
     return obj
 
 
+class _HistoryBuffer(object):
+    """
+    Growable buffer of rows of float64 values, each with a time stamp. Capacity is
+    doubled when full so appending a row is amortized O(1).
+
+    Parameters
+    ----------
+    columns : list
+        names of the value columns
+    capacity : int, optional
+        initial number of rows
+
+    """
+
+    __slots__ = ("columns", "times", "values", "_frame")
+
+    def __init__(self, columns, capacity=1024):
+        self.columns = list(columns)
+        self.times = []
+        self.values = np.empty((capacity, len(self.columns)))
+        self._frame = None
+
+    def add_rows(self, times, values):
+        """
+        Adds a block of rows at times. Nothing is stored if values does not have one
+        row per time and one value per column.
+
+        Parameters
+        ----------
+        times : list
+            time stamps of the rows
+        values : numpy.ndarray or list
+            values of the rows with shape (number of times, number of columns)
+
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        assert values.shape == (
+            len(times),
+            len(self.columns),
+        ), f"rows must have {len(self.columns)} values."
+        n = len(self.times)
+        end = n + len(times)
+        if end > self.values.shape[0]:
+            capacity = self.values.shape[0]
+            while capacity < end:
+                capacity *= 2
+            grown = np.empty((capacity, self.values.shape[1]))
+            grown[:n] = self.values[:n]
+            self.values = grown
+        self.values[n:end] = values
+        self.times.extend(times)
+        self._frame = None
+
+    def add_row(self, time, values):
+        """
+        Adds a row at time. Nothing is stored if values does not have one value per
+        column.
+
+        Parameters
+        ----------
+        time : pandas.Timestamp or datetime
+            time stamp of the row
+        values : numpy.ndarray or list
+            values of the row
+
+        """
+
+        self.add_rows([time], np.asarray(values, dtype=np.float64)[np.newaxis])
+
+    def to_frame(self):
+        """
+        Returns the stored rows as a DataFrame with a leading 'Time' column, or None
+        if there are no rows
+
+        Returns
+        -------
+        frame : pandas.DataFrame or None
+            stored rows
+
+        """
+
+        if not self.times:
+            return None
+        if self._frame is None:
+            frame = pd.DataFrame(
+                self.values[: len(self.times)], columns=self.columns, copy=True
+            )
+            frame.insert(0, "Time", self.times)
+            self._frame = frame
+        return self._frame
+
+    def clear(self):
+        """
+        Removes all rows (capacity is kept)
+
+        """
+
+        self.times = []
+        self._frame = None
+
+
+class RewardBundle(Mapping):
+    """
+    Reward/price forecasts of several RewardForecast objects stored in one array.
+
+    The bundle behaves as a dictionary from reward/price name to its row of samples
+    (names cannot be added or removed), so it can be passed to any Optimization object
+    expecting a rewards dictionary, while the whole (K, n) array is available for
+    vectorized use.
+
+    Rows are views into matrix, not copies. CollectedNextDispatch reuses one matrix and
+    overwrites it on every time step, so an Optimization object must copy any row it
+    keeps past the current return_next_dispatch call (and should not write to it).
+
+    Parameters
+    ----------
+    names : list or tuple
+        names of reward/price forecasts, in row order
+    matrix : numpy.ndarray
+        reward/price samples with shape (number of names, n)
+
+    Attributes
+    ----------
+    names : tuple
+        names of reward/price forecasts, in row order
+    matrix : numpy.ndarray
+        reward/price samples with shape (number of names, n)
+
+    """
+
+    __slots__ = ("names", "matrix", "_index")
+
+    def __init__(self, names, matrix):
+        self.names = tuple(names)
+        self.matrix = matrix
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __getitem__(self, key):
+        return self.matrix[self._index[key]]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
 class CollectedNextDispatch(object):
     """
     ORCA Workflow Object
@@ -50,6 +270,15 @@ class CollectedNextDispatch(object):
     and RewardForecast objects. Methods are provided to get the next step's
     optimal dispatch and stores the history.
 
+    Reward/price forecasts are generated in a thread pool when the spec file sets
+    'parallel_rewards: true' and there are at least 'parallel_rewards_threshold'
+    (default 8) RewardForecast objects. This only speeds up gen_reward methods that
+    release the GIL (e.g. large NumPy operations). The pool's worker threads are
+    stopped by close(), or on leaving a with block:
+
+    with CollectedNextDispatch(spec_path) as orca:
+        orca.return_optimal_next_dispatch(time, x_init)
+
     Parameters
     ----------
     spec_path : str
@@ -63,31 +292,46 @@ class CollectedNextDispatch(object):
         optimization object
     reward : dict
         dictionary of all ORCA.RewardForecast objects
-    initial_states : pandas.DataFrame
+    initial_states : pandas.DataFrame or None
         DataFrame of initial state values at each time step
-    optimal_results : pandas.DataFrame
+    optimal_results : pandas.DataFrame or None
         DataFrame of results of optimization including states, controls, measurements, and rewards
 
     Methods
     -------
     return_optimal_next_dispatch(time, x_init)
         returns optimal next dispatch states, controls, and measurements
+    return_optimal_next_dispatch_batch(times, x_inits)
+        returns optimal next dispatch states, controls, and measurements for a batch of time steps
     reset_objects()
         resets counter in RewardForecast objects, sets initial_states and optimal_results to None
+    close()
+        shuts down the reward/price thread pool, if any
 
     """
 
+    __slots__ = (
+        "specs",
+        "optimization",
+        "reward",
+        "_state_order",
+        "_control_order",
+        "_meas_order",
+        "_dt_delta",
+        "_rewards",
+        "_reward_pool",
+        "_initial_buffer",
+        "_optimal_buffer",
+        "_optimal_slices",
+    )
+
     def __init__(self, spec_path):
         # ensure spec_path is a valid file path
         assert os.path.isfile(
             spec_path
         ), f"{spec_path} is not a valid path to a YAML spec file."
-        # parse spec file
-        try:
-            with open(spec_path, "r") as f:
-                self.specs = yaml.load(f, Loader=Loader)
-        except yaml.YAMLError as exc:
-            raise ValueError(f"{spec_path} spec file could not be parsed: ", exc)
+        # parse spec file (copied since the parsed result is cached and mutated below)
+        self.specs = copy.deepcopy(_read_spec(spec_path))
         # ensure required keys are in specs
         req_keys = ["t_window", "dt", "optimization", "reward"]
         for key in req_keys:
@@ -118,16 +362,81 @@ class CollectedNextDispatch(object):
                 self.specs["reward"][key], "RewardForecast"
             )
 
-        # set up placeholders for initial_states and optimal_results
-        self.initial_states = None
-        self.optimal_results = None
+        # cache variable orders and time step used when storing results
+        opt_specs = self.specs["optimization"]
+        self._state_order = opt_specs["states"]["order"]
+        self._control_order = opt_specs["control"]["order"]
+        if self.optimization.measurements is not None:
+            self._meas_order = opt_specs["measurements"]["order"]
+        else:
+            self._meas_order = None
+        self._dt_delta = pd.Timedelta(minutes=self.specs["dt"])
+
+        # preallocate reward/price buffer (one row per RewardForecast)
+        self._rewards = RewardBundle(
+            self.reward, np.empty((len(self.reward), self.optimization.n))
+        )
+
+        # optionally generate reward/price forecasts in a thread pool
+        parallel = self.specs.get("parallel_rewards", False)
+        threshold = self.specs.get("parallel_rewards_threshold", 8)
+        assert isinstance(parallel, bool), "parallel_rewards must be bool."
+        assert isinstance(threshold, int), "parallel_rewards_threshold must be int."
+        if parallel and len(self.reward) >= threshold:
+            self._reward_pool = ThreadPoolExecutor(
+                max_workers=min(len(self.reward), os.cpu_count() or 1)
+            )
+        else:
+            self._reward_pool = None
+
+        # set up row buffers for initial_states and optimal_results, optimal_results
+        # columns are states, control, measurements, then rewards
+        meas_order = self._meas_order if self._meas_order is not None else []
+        self._initial_buffer = _HistoryBuffer(self._state_order)
+        self._optimal_buffer = _HistoryBuffer(
+            list(self._state_order)
+            + list(self._control_order)
+            + list(meas_order)
+            + list(self._rewards.names)
+        )
+        edges = np.cumsum(
+            [
+                0,
+                len(self._state_order),
+                len(self._control_order),
+                len(meas_order),
+                len(self._rewards),
+            ]
+        )
+        self._optimal_slices = [slice(a, b) for a, b in zip(edges[:-1], edges[1:])]
+
+    @property
+    def initial_states(self):
+        """
+        DataFrame of initial state values at each time step, or None if no steps
+        have been taken. Built lazily from the stored rows.
+
+        """
+
+        return self._initial_buffer.to_frame()
+
+    @property
+    def optimal_results(self):
+        """
+        DataFrame of optimization results at each time step, or None if no steps
+        have been taken. Built lazily from the stored rows.
+
+        """
+
+        return self._optimal_buffer.to_frame()
 
     def return_optimal_next_dispatch(self, time, x_init):
         """
         Returns and stores optimal next dispatch by running gen_reward for each RewardForecast
         and return_next_dispatch from the Optimization object.
 
-        Results are stored in initial_states and optimal_results as pandas DataFrames.
+        Results are buffered row by row and exposed through initial_states and
+        optimal_results as pandas DataFrames.
 
         Parameters
         ----------
@@ -144,55 +453,130 @@ class CollectedNextDispatch(object):
         """
 
         # store the initial states
-        initial_dict = {"Time": time}
-        for i in range(len(self.specs["optimization"]["states"]["order"])):
-            initial_dict[self.specs["optimization"]["states"]["order"][i]] = [x_init[i]]
-        initial = pd.DataFrame(initial_dict)
-        if self.initial_states is None:
-            self.initial_states = initial
-        else:
-            self.initial_states = pd.concat(
-                [self.initial_states, initial], ignore_index=True
-            )
+        self._initial_buffer.add_row(time, x_init)
 
-        # generate reward/price forecasts
-        rewards = {key: self.reward[key].gen_reward() for key in self.reward}
+        # generate reward/price forecasts into the preallocated buffer
+        self._gen_rewards(self._rewards.matrix[np.newaxis])
 
         # get the optimal next dispatch
-        result = self.optimization.return_next_dispatch(rewards, x_init)
-
-        # store result in optimal_results
-        current_time = time + pd.Timedelta(minutes=self.specs["dt"])
-        optimal_dict = {"Time": [current_time]}
-        # store states
-        for i in range(len(self.specs["optimization"]["states"]["order"])):
-            optimal_dict[self.specs["optimization"]["states"]["order"][i]] = [
-                result["states"][i]
-            ]
-        # store control
-        for i in range(len(self.specs["optimization"]["control"]["order"])):
-            optimal_dict[self.specs["optimization"]["control"]["order"][i]] = [
-                result["control"][i]
-            ]
+        result = self.optimization.return_next_dispatch(self._rewards, x_init)
+
+        # store result in optimal_results (filled in before it is added, so a result
+        # with the wrong number of values stores nothing)
+        row = np.empty(len(self._optimal_buffer.columns))
+        states, control, measurements, rewards = self._optimal_slices
+        row[states] = result["states"]
+        row[control] = result["control"]
         # store measurements if specified
-        if self.optimization.measurements is not None:
-            for i in range(len(self.specs["optimization"]["measurements"]["order"])):
-                optimal_dict[self.specs["optimization"]["measurements"]["order"][i]] = [
-                    result["measurements"][i]
-                ]
+        if self._meas_order is not None:
+            row[measurements] = result["measurements"]
         # store rewards
-        for key in rewards:
-            optimal_dict[key] = [rewards[key][1]]
-        optimal = pd.DataFrame(optimal_dict)
-        if self.optimal_results is None:
-            self.optimal_results = optimal
-        else:
-            self.optimal_results = pd.concat(
-                [self.optimal_results, optimal], ignore_index=True
-            )
+        row[rewards] = self._rewards.matrix[:, 1]
+        self._optimal_buffer.add_row(time + self._dt_delta, row)
 
         return result
 
+    def return_optimal_next_dispatch_batch(self, times, x_inits):
+        """
+        Returns and stores optimal next dispatch for a batch of time steps, e.g. to
+        replay a rolling horizon offline with known initial states.
+
+        Gives the same results as calling return_optimal_next_dispatch for each time
+        and initial state in order, but all reward/price forecasts are generated up
+        front and results are stored as one block. The batch is all or nothing: if
+        any step raises, nothing is stored and the RewardForecast counters are put
+        back to where they were before the call.
+
+        Parameters
+        ----------
+        times : list
+            initial times for optimization (pandas.Timestamp or datetime)
+        x_inits : numpy.ndarray or list
+            initial state values with shape (number of times, number of states), in
+            order of specs['states']['order']
+
+        Returns
+        -------
+        results : dict
+            dictionary with states, control, and measurement values as numpy.ndarray
+            with one row per time
+
+        """
+
+        times = list(times)
+        x_inits = np.asarray(x_inits, dtype=np.float64)
+        if not times and x_inits.size == 0:
+            # an empty batch, e.g. np.asarray([]) has shape (0,)
+            x_inits = x_inits.reshape((0, len(self._state_order)))
+        assert x_inits.shape == (
+            len(times),
+            len(self._state_order),
+        ), "x_inits must have one row of initial states per time."
+
+        states, control, measurements, rewards = self._optimal_slices
+        optimal = np.empty((len(times), len(self._optimal_buffer.columns)))
+        counters = {key: self.reward[key].i for key in self.reward}
+        try:
+            # generate reward/price forecasts for all time steps
+            rewards_all = np.empty((len(times),) + self._rewards.matrix.shape)
+            self._gen_rewards(rewards_all)
+
+            # get the optimal next dispatch for each time step
+            for t, x_init in enumerate(x_inits):
+                result = self.optimization.return_next_dispatch(
+                    RewardBundle(self._rewards.names, rewards_all[t]), x_init
+                )
+                optimal[t, states] = result["states"]
+                optimal[t, control] = result["control"]
+                if self._meas_order is not None:
+                    optimal[t, measurements] = result["measurements"]
+        except Exception:
+            # undo the forecasts generated for the batch
+            for key, i in counters.items():
+                self.reward[key].i = i
+            raise
+        optimal[:, rewards] = rewards_all[:, :, 1]
+
+        # store initial states and results
+        self._initial_buffer.add_rows(times, x_inits)
+        next_times = [time + self._dt_delta for time in times]
+        self._optimal_buffer.add_rows(next_times, optimal)
+
+        return {
+            "states": optimal[:, states],
+            "control": optimal[:, control],
+            "measurements": optimal[:, measurements],
+        }
+
+    def _gen_rewards(self, out):
+        """
+        Generates reward/price forecasts for successive time steps, in a thread pool
+        (one task per RewardForecast) if enabled
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+            array with shape (number of time steps, number of rewards, n) that
+            receives the reward/price data
+
+        """
+
+        def gen_steps(key, rows):
+            for row in rows:
+                self.reward[key].gen_reward_into(row)
+
+        if self._reward_pool is None:
+            for i, key in enumerate(self._rewards.names):
+                gen_steps(key, out[:, i])
+        else:
+            futures = [
+                self._reward_pool.submit(gen_steps, key, out[:, i])
+                for i, key in enumerate(self._rewards.names)
+            ]
+            for future in futures:
+                # propagates any exception raised in gen_reward_into
+                future.result()
+
     def reset_objects(self):
         """
         Returns the counter in RewardForecast objects to 0 and sets initial_states
@@ -204,5 +588,23 @@ class CollectedNextDispatch(object):
         for key in self.reward:
             self.reward[key].i = 0
 
-        # set initial_states and optimal_results to None
-        self.initial_states, self.optimal_results = None, None
+        # clear stored rows so initial_states and optimal_results return None
+        self._initial_buffer.clear()
+        self._optimal_buffer.clear()
+
+    def close(self):
+        """
+        Shuts down the reward/price thread pool (if one was started). Later calls
+        generate reward/price forecasts serially.
+
+        """
+
+        if self._reward_pool is not None:
+            self._reward_pool.shutdown(wait=True)
+            self._reward_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,11 +1,17 @@
 import os
 import pickle
+import tempfile
 import xml.etree.ElementTree as ET
 import numpy as np
 import pyomo.environ as pyo
+from pyomo.core.expr.numeric_expr import LinearExpression
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
 
 from ORCA.Basic.Optimization import Optimization
 
+# solvers that have an in-memory APPSI interface (model is kept between solves)
+_APPSI_SOLVERS = {"gurobi": "appsi_gurobi", "highs": "appsi_highs"}
+
 
 class LTIStateSpaceMPCPyomoOptimization(Optimization):
     """
@@ -16,10 +22,18 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
     x_k = Ax_{k-1} + Bu_{k-1}
     y_k = Cx_k
 
+    The model is built once and re-solved with new reward/price and initial state
+    Param values. 'highs' and 'gurobi' use the persistent APPSI interfaces
+    (appsi_highs, appsi_gurobi) when available, with the checks for structural changes
+    made before each re-solve turned off. Legacy persistent solvers (e.g.
+    gurobi_persistent) are given the model once with set_instance. In both cases,
+    variables, constraints, or objectives added to or changed on model after
+    instantiation are ignored by later solves; build a new object instead.
+
     Parameters
     ----------
     solver : str
-        name of solver for Pyomo to use
+        name of solver for Pyomo to use ('highs' and 'gurobi' use APPSI when available)
     matrices : str
         path to file containing A, B, C matrices
     t_window : float
@@ -38,7 +52,7 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
     Attributes
     ----------
     solver : pyomo.environ.SolverFactory
-        solver for Pyomo problem
+        solver for Pyomo problem (persistent interface when available)
     A : numpy.ndarray
         state transition matrix
     B : numpy.ndarray
@@ -90,8 +104,15 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
     def __init__(self, solver="cbc", matrices=None, **specs):
         super().__init__(**specs)
 
-        # set solver for optimization (rely on Pyomo for error handling)
-        self.solver = pyo.SolverFactory(solver)
+        # set solver for optimization (rely on Pyomo for error handling), using the
+        # persistent APPSI interface when one is available for the named solver
+        self.solver = None
+        if solver in _APPSI_SOLVERS:
+            appsi_solver = pyo.SolverFactory(_APPSI_SOLVERS[solver])
+            if appsi_solver.available(exception_flag=False):
+                self.solver = appsi_solver
+        if self.solver is None:
+            self.solver = pyo.SolverFactory(solver)
 
         # read in A, B, C matrices from file
         assert os.path.isfile(
@@ -99,8 +120,9 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
         ), f"{matrices} file for A, B, C matrices not found."
         assert matrices.lower()[-3:] in [
             "pkl",
+            "npz",
             "xml",
-        ], f"A, B, C matrices file must be pkl or xml."
+        ], f"A, B, C matrices file must be pkl, npz or xml."
         self.load_state_space_matrices(matrices)
 
         # check that inputs are sufficient to build the Pyomo model
@@ -121,17 +143,57 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
                 self.C.shape[1] == self.A.shape[0]
             ), f"C loaded from {matrices} must have same number of columns as x entries."
 
+        # row-contiguous float64 copies (rows are sliced below), read-only since the
+        # model is built from them (copied so the loaded arrays stay writable)
+        self.A = np.array(self.A, dtype=np.float64, order="C", copy=True)
+        self.B = np.array(self.B, dtype=np.float64, order="C", copy=True)
+        self.A.setflags(write=False)
+        self.B.setflags(write=False)
+        if self.C is not None:
+            self.C = np.array(self.C, dtype=np.float64, order="C", copy=True)
+            self.C.setflags(write=False)
+
+        # column indices of nonzero entries in each row of A, B, C (terms with zero
+        # coefficients are left out of the constraints)
+        self._A_nz = [np.flatnonzero(np.abs(row) > 1e-14) for row in self.A]
+        self._B_nz = [np.flatnonzero(np.abs(row) > 1e-14) for row in self.B]
+        if self.C is not None:
+            self._C_nz = [np.flatnonzero(np.abs(row) > 1e-14) for row in self.C]
+        else:
+            self._C_nz = None
+        # matching coefficients as lists of floats, converted once for all time steps
+        self._state_coefs = [
+            self.A[i, a_nz].tolist() + self.B[i, b_nz].tolist()
+            for i, (a_nz, b_nz) in enumerate(zip(self._A_nz, self._B_nz))
+        ]
+        if self.C is not None:
+            self._measurement_coefs = [
+                self.C[i, c_nz].tolist() for i, c_nz in enumerate(self._C_nz)
+            ]
+        else:
+            self._measurement_coefs = None
+
+        # nonzero objective coefficients of each reward/price and their positions in
+        # (states, control, measurements), converted once for all time steps
+        self._objective_coefs = {}
+        for key, (state_mul, control_mul, meas_mul) in self._multipliers.items():
+            coefs = state_mul.tolist() + control_mul.tolist()
+            if self.measurements is not None:
+                # measurement_multiplier is optional (no measurement terms if missing)
+                if meas_mul is not None:
+                    coefs += meas_mul.tolist()
+                else:
+                    coefs += [0.0] * len(self.measurements["order"])
+            nz = [k for k, c in enumerate(coefs) if c != 0.0]
+            self._objective_coefs[key] = (nz, [coefs[k] for k in nz])
+
         # build the Pyomo ConcreteModel
         self.model = pyo.ConcreteModel()
 
-        # set up index for variables
-        self.model.t = pyo.Set(initialize=np.arange(0, self.n, dtype=int))  # time
-        self.model.xi = pyo.Set(
-            initialize=np.arange(0, len(self.states["order"]), dtype=int)
-        )  # states
-        self.model.ui = pyo.Set(
-            initialize=np.arange(0, len(self.control["order"]), dtype=int)
-        )  # control
+        # set up index for variables (integer ranges stored as bounds only)
+        self.model.t = pyo.RangeSet(0, self.n - 1)  # time
+        self.model.xi = pyo.RangeSet(0, len(self.states["order"]) - 1)  # states
+        self.model.ui = pyo.RangeSet(0, len(self.control["order"]) - 1)  # control
         rewards = list(self.objective.keys())
         rewards.remove("sense")  # sense is not one of the rewards
         self.model.pi = pyo.Set(initialize=rewards)
@@ -141,40 +203,39 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
             self.model.xi, initialize=[0.0] * len(self.states["order"]), mutable=True
         )
 
-        # state variables
+        # state variables (bounded only by lb and ub)
         self.model.x = pyo.Var(
             self.model.xi,
             self.model.t,
-            domain=pyo.NonNegativeReals,
+            domain=pyo.Reals,
             bounds=self.x_bounds,
         )
 
-        # control variables
+        # control variables (bounded only by lb and ub)
         self.model.u = pyo.Var(
             self.model.ui,
             self.model.t,
-            domain=pyo.NonNegativeReals,
+            domain=pyo.Reals,
             bounds=self.u_bounds,
         )
 
-        # measurement variables
+        # measurement variables (bounded only by lb and ub)
         if self.measurements is not None:
-            self.model.yi = pyo.Set(
-                initialize=np.arange(0, len(self.measurements["order"]), dtype=int)
-            )
+            self.model.yi = pyo.RangeSet(0, len(self.measurements["order"]) - 1)
             self.model.y = pyo.Var(
                 self.model.yi,
                 self.model.t,
-                domain=pyo.NonNegativeReals,
+                domain=pyo.Reals,
                 bounds=self.y_bounds,
             )
         else:
             self.model.yi = None
             self.model.y = None
 
-        # reward/price initialization (updated when model is optimized)
+        # reward/price initialization to zero (updated when model is optimized), a
+        # constant avoids a Python callback for every (i, t)
         self.model.P = pyo.Param(
-            self.model.pi, self.model.t, initialize=self.initialize_reward, mutable=True
+            self.model.pi, self.model.t, initialize=0.0, mutable=True
         )
 
         # constraints
@@ -189,7 +250,7 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
             self.model.measurement = None
 
         # objective function
-        obj = sum(
+        obj = pyo.quicksum(
             self.objective_kernel(i, t) for t in self.model.t for i in self.model.pi
         )
         if self.objective["sense"] == "maximize":
@@ -198,11 +259,53 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
             sense = pyo.minimize
         self.model.objective = pyo.Objective(rule=obj, sense=sense)
 
+        # Param indices updated by solve_model (in time and state order)
+        self._P_index = {key: [(key, t) for t in self.model.t] for key in self.model.pi}
+        self._x_init_index = list(self.model.xi)
+
+        # variable data objects of the next step read by return_next_dispatch (a
+        # single step horizon has no next step, but can still be solved)
+        self._next_data = None
+        if self.n > 1:
+            self._next_data = {
+                "states": [self.model.x[i, 1] for i in self.model.xi],
+                "control": [self.model.u[i, 1] for i in self.model.ui],
+                "measurements": (
+                    [self.model.y[i, 1] for i in self.model.yi]
+                    if self.measurements is not None
+                    else []
+                ),
+            }
+
+        # legacy persistent solvers (e.g. gurobi_persistent) are given the model
+        # once and warm started from the previous solution (APPSI solvers keep the
+        # model and pick up Param changes on their own)
+        self._persistent = isinstance(self.solver, PersistentSolver)
+        self._solve_kwargs = {}
+        if self._persistent:
+            self.solver.set_instance(self.model)
+            if self.solver.warm_start_capable():
+                self._solve_kwargs["warmstart"] = True
+        elif hasattr(self.solver, "update_config"):
+            # APPSI solvers: only Param values change between solves, so skip the
+            # structural checks made before each re-solve
+            config = self.solver.update_config
+            config.check_for_new_or_removed_constraints = False
+            config.check_for_new_or_removed_vars = False
+            config.check_for_new_or_removed_params = False
+            config.check_for_new_objective = False
+            config.update_constraints = False
+            config.update_vars = False
+            config.update_named_expressions = False
+            config.update_objective = False
+
     def load_state_space_matrices(self, matrices_path):
         """
         Loads the state space matrices (A, B, C) into the specs from the
-        file given in the specs. This file can be a pickled dictionary
-        or a RAVEN DMDc metadata XML file.
+        file given in the specs. This file can be a pickled dictionary, a
+        NumPy .npz archive, or a RAVEN DMDc metadata XML file. Matrices parsed from XML are
+        cached next to the file as .npz and reused while the XML modification time and
+        size match the ones recorded in the cache.
 
         Parameters
         ----------
@@ -212,11 +315,55 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
         """
 
         if matrices_path.lower().endswith("xml"):
+            # the cache records the modification time and size of the XML it was
+            # parsed from and is only used when both match exactly
+            cache = matrices_path + ".npz"
+            stat = os.stat(matrices_path)
+            source = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+            try:
+                with np.load(cache) as data:
+                    if np.array_equal(data["source"], source):
+                        self.A = data["A"]
+                        self.B = data["B"]
+                        self.C = data["C"]
+                        return
+            except (OSError, KeyError, ValueError):
+                # missing, unreadable, or older cache format, parse the XML
+                pass
+
             tree = ET.parse(matrices_path)
             root = tree.getroot()
             self.A = self.load_matrix_from_xml(root, "A")
             self.B = self.load_matrix_from_xml(root, "B")
             self.C = self.load_matrix_from_xml(root, "C")
+            # write to a uniquely named file first so concurrent readers never see a
+            # partially written cache
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(
+                    suffix=".npz",
+                    prefix=os.path.basename(matrices_path) + ".",
+                    dir=os.path.dirname(os.path.abspath(matrices_path)),
+                )
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, A=self.A, B=self.B, C=self.C, source=source)
+                os.replace(tmp, cache)
+            except OSError:
+                # cache is optional (e.g. read-only directory)
+                if tmp is not None and os.path.isfile(tmp):
+                    os.remove(tmp)
+        elif matrices_path.lower().endswith("npz"):
+            # arrays are read straight from the archive, no unpickling
+            try:
+                with np.load(matrices_path) as data:
+                    self.A = data["A"]
+                    self.B = data["B"]
+                    self.C = data["C"]
+            except Exception as e:
+                raise ValueError(
+                    f"matrices npz file {matrices_path} had errors: ",
+                    e,
+                )
         else:
             # should be a pickled dictionary
             try:
@@ -256,11 +403,8 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
         # shape of matrix
         shape = tilde.find(".//matrixShape").text.split(",")
         shape = [int(tmp) for tmp in shape]
-        # values of matrix
-        vals = tilde.find(".//real").text.split(" ")
-        vals = [float(tmp) for tmp in vals]
-        # cast to numpy array
-        matrix = np.array(vals)
+        # values of matrix (parsed by NumPy)
+        matrix = np.fromstring(tilde.find(".//real").text, sep=" ", dtype=np.float64)
         # reshape (uses Fortran ordering, first index fastest then second)
         matrix = matrix.reshape(shape, order="F")
 
@@ -376,8 +520,12 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
             sol = self.model.x_init[i]
         else:
             # state update
-            sol = sum(self.A[i, j] * self.model.x[j, t - 1] for j in self.model.xi)
-            sol += sum(self.B[i, k] * self.model.u[k, t - 1] for k in self.model.ui)
+            sol = LinearExpression(
+                constant=0.0,
+                linear_coefs=self._state_coefs[i],
+                linear_vars=[self.model.x[j, t - 1] for j in self._A_nz[i]]
+                + [self.model.u[k, t - 1] for k in self._B_nz[i]],
+            )
 
         return self.model.x[i, t] == sol
 
@@ -398,7 +546,11 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
 
         """
 
-        sol = sum(self.C[i, j] * self.model.x[j, t] for j in self.model.xi)
+        sol = LinearExpression(
+            constant=0.0,
+            linear_coefs=self._measurement_coefs[i],
+            linear_vars=[self.model.x[j, t] for j in self._C_nz[i]],
+        )
 
         return self.model.y[i, t] == sol
 
@@ -416,27 +568,25 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
         Returns
         -------
         f : pyomo
-            Pyomo EqualityExpression
+            Pyomo LinearExpression
 
         """
 
-        f = self.model.P[i, t] * (
-            sum(
-                self.objective[i]["state_multiplier"][j] * self.model.x[j, t]
-                for j in self.model.xi
-            )
-            + sum(
-                self.objective[i]["control_multiplier"][k] * self.model.u[k, t]
-                for k in self.model.ui
-            )
-        )
+        # states, control, and measurements at time t
+        terms = [self.model.x[j, t] for j in self.model.xi]
+        terms += [self.model.u[k, t] for k in self.model.ui]
         if self.measurements is not None:
-            f += self.model.P[i, t] * (
-                sum(
-                    self.objective[i]["measurement_multiplier"][l] * self.model.y[l, t]
-                    for l in self.model.yi
-                )
-            )
+            terms += [self.model.y[l, t] for l in self.model.yi]
+
+        # reward/price distributed into the coefficients so the expression stays a
+        # flat linear form (P is a Param, so P*c is a fixed coefficient)
+        nz, coefs = self._objective_coefs[i]
+        P = self.model.P[i, t]
+        f = LinearExpression(
+            constant=0.0,
+            linear_coefs=[P * c for c in coefs],
+            linear_vars=[terms[k] for k in nz],
+        )
 
         return f
 
@@ -457,17 +607,34 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
 
         """
 
-        # update the reward/price in the Pyomo ConcreteModel
+        # update the reward/price in the Pyomo ConcreteModel in one batch (indices
+        # are known to be valid, so Pyomo's per-item checks are skipped)
+        P_values = {}
         for key in rewards:
-            for x in self.model.t:
-                self.model.P[key, x] = rewards[key][x]
+            assert key in self._P_index, f"{key} not in objective rewards/prices."
+            values = np.asarray(rewards[key], dtype=np.float64)
+            assert len(values) >= self.n, f"{key} must have n reward/price samples."
+            P_values.update(zip(self._P_index[key], values[: self.n].tolist()))
+        self.model.P.store_values(P_values, check=False)
 
         # update initial state values
-        for i in self.model.xi:
-            self.model.x_init[i] = x_init[i]
+        values = np.asarray(x_init, dtype=np.float64).tolist()
+        assert len(values) >= len(self._x_init_index), "x_init missing state values."
+        self.model.x_init.store_values(
+            dict(zip(self._x_init_index, values)), check=False
+        )
+
+        # legacy persistent solvers do not track mutable Params, so refresh the
+        # objective and the initial state constraints they appear in
+        if self._persistent:
+            self.solver.set_objective(self.model.objective)
+            t0 = self.model.t.first()
+            for i in self.model.xi:
+                self.solver.remove_constraint(self.model.state[i, t0])
+                self.solver.add_constraint(self.model.state[i, t0])
 
         # solve model
-        results = self.solver.solve(self.model)
+        results = self.solver.solve(self.model, **self._solve_kwargs)
 
         return results
 
@@ -489,20 +656,17 @@ class LTIStateSpaceMPCPyomoOptimization(Optimization):
 
         """
 
+        assert (
+            self._next_data is not None
+        ), "time horizon must contain at least two time steps to return the next dispatch."
+
         # solve the model
         _ = self.solve_model(rewards, x_init)
 
         # return values of states, control, measurements
-        result = {"states": [], "control": [], "measurements": []}
-        # states
-        for i in self.model.xi:
-            result["states"].append(pyo.value(self.model.x[i, 1]))
-        # control
-        for i in self.model.ui:
-            result["control"].append(pyo.value(self.model.u[i, 1]))
-        # measurements
-        if self.measurements is not None:
-            for i in self.model.yi:
-                result["measurements"].append(pyo.value(self.model.y[i, 1]))
+        result = {
+            key: [data.value for data in self._next_data[key]]
+            for key in ("states", "control", "measurements")
+        }
 
         return result
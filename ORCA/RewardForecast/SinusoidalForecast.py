@@ -1,7 +1,11 @@
+import math
 import numpy as np
 
 from ORCA.Basic.RewardForecast import RewardForecast
 
+# largest period (in samples) that is tabulated instead of evaluated on each call
+_MAX_TABLE_PERIOD = 100000
+
 
 class SinusoidalForecast(RewardForecast):
     """
@@ -14,6 +18,11 @@ class SinusoidalForecast(RewardForecast):
 
     x is generated as np.arange(i, i+n+1)
 
+    Samples are precomputed at instantiation (one tabulated period when the sinusoid
+    repeats every whole number of samples, otherwise per-step sines and cosines for
+    angle addition). amplitude, phase, frequency, offset, and n may still be changed
+    afterwards, the precomputed samples are rebuilt on the next call to gen_reward.
+
     Parameters
     ----------
     t_window : float
@@ -52,9 +61,24 @@ class SinusoidalForecast(RewardForecast):
     -------
     gen_reward()
         generates n sinusoidal reward/price values to use in MPC time horizon optimization
+    gen_reward_into(out)
+        generates n sinusoidal reward/price values and writes them into a preallocated array
 
     """
 
+    __slots__ = (
+        "amplitude",
+        "phase",
+        "frequency",
+        "offset",
+        "_period",
+        "_table",
+        "_sin_steps",
+        "_cos_steps",
+        "_scratch",
+        "_built",
+    )
+
     def __init__(
         self,
         amplitude=10.0,
@@ -75,6 +99,46 @@ class SinusoidalForecast(RewardForecast):
         assert isinstance(offset, float), "offset must be float"
         self.offset = offset
 
+        # precompute samples (rebuilt by gen_reward_into if any parameter changes)
+        self._precompute()
+
+    def _precompute(self):
+        """
+        Precomputes the samples used by gen_reward_into for the current amplitude,
+        phase, frequency, offset, and n
+
+        """
+
+        self._built = (self.amplitude, self.phase, self.frequency, self.offset, self.n)
+
+        # when the sinusoid repeats every whole number of samples, tabulate one
+        # period (plus n samples so any horizon is a contiguous slice), only if
+        # frequency*period matches 2*pi to a few ulps since the phase error of the
+        # table grows with every period
+        period = 2 * np.pi / self.frequency if self.frequency != 0.0 else np.inf
+        self._period = None
+        self._table = None
+        if np.isfinite(period) and 0 < round(period) <= _MAX_TABLE_PERIOD:
+            drift = abs(self.frequency * round(period) - 2 * np.pi)
+            if drift <= 4 * np.spacing(2 * np.pi):
+                self._period = int(round(period))
+                x = np.arange(self._period, dtype=np.float64)
+                one_period = self.offset + self.amplitude * np.sin(
+                    self.frequency * x + self.phase
+                )
+                self._table = np.resize(one_period, self._period + self.n)
+
+        # otherwise use angle addition, sin(a + f*k) = sin(a)*cos(f*k) + cos(a)*sin(f*k)
+        # with a = f*i + phase, so each call needs only one sin and one cos
+        self._sin_steps = None
+        self._cos_steps = None
+        self._scratch = None
+        if self._table is None:
+            steps = self.frequency * np.arange(self.n, dtype=np.float64)
+            self._sin_steps = self.amplitude * np.sin(steps)
+            self._cos_steps = self.amplitude * np.cos(steps)
+            self._scratch = np.empty(self.n)
+
     def gen_reward(self):
         """
         Generates reward/price data as sinusoid for n steps in time horizon
@@ -86,11 +150,45 @@ class SinusoidalForecast(RewardForecast):
 
         """
 
-        # generate indices for samples
-        x = np.arange(self.i, self.i + self.n)
-        # generate sinusoidal samples
-        reward = self.offset + self.amplitude * np.sin(self.frequency * x + self.phase)
-        # update i
-        self.i += 1
+        reward = np.empty(self.n)
+        self.gen_reward_into(reward)
 
         return reward
+
+    def gen_reward_into(self, out):
+        """
+        Generates reward/price data as sinusoid for n steps in time horizon and writes
+        it into the preallocated array out (no sin evaluation per sample)
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+            array of length n that receives the reward/price data
+
+        """
+
+        if self._built != (
+            self.amplitude,
+            self.phase,
+            self.frequency,
+            self.offset,
+            self.n,
+        ):
+            # a parameter was changed after instantiation
+            self._precompute()
+
+        if self._table is not None:
+            # periodic sinusoid, copy samples x = i, ..., i+n-1 from the table
+            start = self.i % self._period
+            out[:] = self._table[start : start + self.n]
+            self.i += 1
+            return
+
+        # generate sinusoidal samples x = i, ..., i+n-1 from the angle at x = i
+        angle = self.frequency * self.i + self.phase
+        np.multiply(self._cos_steps, math.sin(angle), out=out)
+        np.multiply(self._sin_steps, math.cos(angle), out=self._scratch)
+        out += self._scratch
+        out += self.offset
+        # update i
+        self.i += 1
@@ -1,4 +1,5 @@
 import os
+import numpy as np
 import pandas as pd
 
 from ORCA.Basic.RewardForecast import RewardForecast
@@ -16,8 +17,8 @@ class StaticHistoricalForecast(RewardForecast):
         look ahead time horizon for MPC (in minutes)
     dt : float
         constant time step (in minutes)
-    history : pandas.DataFrame
-        historical data
+    history : str
+        path to csv file containing reward/price data
     name : str
         column name that has reward/price data
 
@@ -31,8 +32,8 @@ class StaticHistoricalForecast(RewardForecast):
         number of steps to take in time horizon
     i : int
         index for how many times reward/price have been generated
-    history : str
-        path to csv file containing reward/price data
+    history : pandas.DataFrame
+        historical reward/price data (only the name column is read)
     name : str
         column name that has reward/price data
 
@@ -43,17 +44,25 @@ class StaticHistoricalForecast(RewardForecast):
 
     """
 
+    __slots__ = ("history", "name", "_values")
+
     def __init__(self, history=None, name="LMP", **specs):
         super().__init__(**specs)
 
         # make sure all inputs can be used
         assert isinstance(history, str), "history must be str"
         assert os.path.isfile(history), f"{history} file could not be located."
-        tmp = pd.read_csv(history)
         assert isinstance(name, str), "name must be str"
-        assert name in tmp.columns, f"{name} not in history DataFrame columns."
+        # check the header before reading only the needed column (skipped with
+        # python -O, where asserts are removed)
+        if __debug__:
+            columns = pd.read_csv(history, nrows=0).columns
+            assert name in columns, f"{name} not in history DataFrame columns."
+        tmp = pd.read_csv(history, usecols=[name], dtype={name: np.float64})
         self.history = tmp
         self.name = name
+        # reward/price column as contiguous array so gen_reward skips pandas indexing
+        self._values = tmp[name].to_numpy(dtype=np.float64, copy=True)
 
     def gen_reward(self):
         """
@@ -68,10 +77,10 @@ class StaticHistoricalForecast(RewardForecast):
 
         # get historical samples
         end = self.i + self.n
-        if end > self.history.shape[0]:
+        if end > self._values.shape[0]:
             raise ValueError("samples requested beyond historical data.")
         else:
-            reward = self.history[self.name].values[self.i : end]
+            reward = self._values[self.i : end]
 
         # increment i
         self.i += 1
@@ -1,9 +1,16 @@
 import unittest
+import copy
 import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from unittest import mock
 import numpy as np
 import pyomo
+import pyomo.contrib.appsi.base
 import pyomo.environ as pyo
 from pyomo.opt import SolverStatus, TerminationCondition
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
 import pandas as pd
 from ORCA.Optimization.LTIStateSpaceMPCPyomoOptimization import (
     LTIStateSpaceMPCPyomoOptimization,
@@ -11,25 +18,40 @@ from ORCA.Optimization.LTIStateSpaceMPCPyomoOptimization import (
 from ..data.SamplePKLFile import generate_matrices_pkl_from_csv
 from ORCA.RewardForecast.StaticHistoricalForecast import StaticHistoricalForecast
 
+# (attribute, type) pairs every LTIStateSpaceMPCPyomoOptimization object must have
+_REQUIRED_ATTRIBUTES = (
+    ("solver", pyomo.contrib.appsi.base.LegacySolverInterface),
+    ("A", np.ndarray),
+    ("B", np.ndarray),
+    ("C", np.ndarray),
+    ("model", pyo.ConcreteModel),
+)
+# returned by getattr for missing attributes
+_MISSING = object()
+# GLPK executable is optional, tests that run it are skipped without it
+_HAS_GLPK = pyo.SolverFactory("glpk").available(exception_flag=False)
+
 
 class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
     """
     LTIStateSpaceMPCPyomoOptimization tests.
 
     This tests instantiation and all other methods belonging to StaticHistoricalForecast.
+    Models are solved with the persistent HiGHS interface (appsi_highs), GLPK is only
+    checked at instantiation.
 
     """
 
-    def setUp(self):
-        # generate matrices .pkl file
-        generate_matrices_pkl_from_csv()
+    @classmethod
+    def setUpClass(cls):
+        # generate matrices .pkl file (reused across runs while up to date, written
+        # atomically so test modules can run in parallel)
+        pkl_path = generate_matrices_pkl_from_csv()
 
         # specs for .pkl file
-        self.specs = {
-            "solver": "glpk",
-            "matrices": os.path.join(
-                os.path.dirname(__file__), "..", "data", "ABC.pkl"
-            ),
+        cls.specs = {
+            "solver": "appsi_highs",
+            "matrices": pkl_path,
             "t_window": 720.0,
             "dt": 5.0,
             "states": {"order": ["qNPP", "SOC"], "lb": [0.0, 0.0], "ub": [50.0, 20.0]},
@@ -45,59 +67,142 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
             },
         }
 
-        # specs for .xml file
-        self.specs2 = self.specs.copy()
-        self.specs2["matrices"] = os.path.join(
-            os.path.dirname(__file__), "..", "data", "RAVENDMDc.xml"
+        # specs for .xml file, copied to a private directory since its .npz cache is
+        # written next to it
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.specs2 = copy.deepcopy(cls.specs)
+        cls.specs2["matrices"] = shutil.copy(
+            os.path.join(os.path.dirname(__file__), "..", "data", "RAVENDMDc.xml"),
+            cls.tmp_dir,
+        )
+
+        # model shared by tests that do not modify it, solves use the persistent
+        # HiGHS interface so only changed Params are sent on each solve
+        cls.obj = LTIStateSpaceMPCPyomoOptimization(**cls.specs)
+
+        # expected next dispatch (second row of the historical data) and the first
+        # reward/price forecast from it (read once)
+        history_path = os.path.join(
+            os.path.dirname(__file__), "..", "data", "storage_data.csv"
         )
+        cls.expected = pd.read_csv(history_path, nrows=2).iloc[1]
+        cls.reward = StaticHistoricalForecast(
+            history=history_path, name="LMP"
+        ).gen_reward()
+        cls.reward.setflags(write=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def _fresh_specs(self, **overrides):
+        """
+        Returns a deep copy of the specs with top-level overrides applied.
+
+        Parameters
+        ----------
+        overrides : dict
+            spec entries to replace
+
+        Returns
+        -------
+        specs : dict
+            copy of specs that can be modified freely
+
+        """
 
-    def tearDown(self):
-        os.remove(os.path.join(os.path.dirname(__file__), "..", "data", "ABC.pkl"))
+        specs = copy.deepcopy(self.specs)
+        specs.update(overrides)
+
+        return specs
 
     def test_instantiation(self):
         """
         Tests that LTIStateSpaceMPCPyomoOptimization instantiates correctly with attributes.
         """
 
-        required_attributes = ["solver", "A", "B", "C", "model"]
-        required_type = [
-            pyomo.solvers.plugins.solvers.GLPK.GLPKSHELL,
-            np.ndarray,
-            np.ndarray,
-            np.ndarray,
-            pyo.ConcreteModel,
-        ]
-
         # implicitly tests load_state_space_matrices
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
+        obj = self.obj
         # implicitly tests load_matric_from_xml
         obj2 = LTIStateSpaceMPCPyomoOptimization(**self.specs2)
 
         # for each method, check that attributes exist and are correct type
-        for att, typ in zip(required_attributes, required_type):
-            self.assertTrue(
-                hasattr(obj, att),
-                f"Required attribute {att} missing for LTIStateSpaceMPCPyomoOptimization.",
-            )
-            self.assertTrue(
-                isinstance(getattr(obj, att), typ), f"{att} should be {typ}."
-            )
-            self.assertTrue(
-                hasattr(obj2, att),
-                f"Required attribute {att} missing for LTIStateSpaceMPCPyomoOptimization.",
-            )
-            self.assertTrue(
-                isinstance(getattr(obj2, att), typ), f"{att} should be {typ}."
+        for att, typ in _REQUIRED_ATTRIBUTES:
+            for value in (getattr(obj, att, _MISSING), getattr(obj2, att, _MISSING)):
+                self.assertIsNot(
+                    value,
+                    _MISSING,
+                    f"Required attribute {att} missing for LTIStateSpaceMPCPyomoOptimization.",
+                )
+                self.assertIsInstance(value, typ, f"{att} should be {typ}.")
+
+    def test_glpk_solver(self):
+        """
+        Tests that solvers without a persistent interface are used through SolverFactory
+        and solve the model (when the GLPK executable is available).
+        """
+
+        obj = LTIStateSpaceMPCPyomoOptimization(**self._fresh_specs(solver="glpk"))
+        self.assertIsInstance(
+            obj.solver,
+            pyomo.solvers.plugins.solvers.GLPK.GLPKSHELL,
+            "solver should be pyomo.solvers.plugins.solvers.GLPK.GLPKSHELL.",
+        )
+
+        if not _HAS_GLPK:
+            self.skipTest("glpk not available")
+        results = obj.solve_model({"price": self.reward}, [50.0, 0.0])
+        self.assertEqual(
+            results.solver.termination_condition,
+            TerminationCondition.optimal,
+            "LTIStateSpaceMPCPyomoOptimization termination condition not optimal with glpk.",
+        )
+
+    def test_legacy_persistent_solver(self):
+        """
+        Tests that legacy persistent solvers are given the model once, warm started, and
+        have the objective and initial state constraints refreshed before each solve.
+        """
+
+        solver = mock.Mock(spec=PersistentSolver)
+        solver.warm_start_capable.return_value = True
+        with mock.patch.object(pyo, "SolverFactory", return_value=solver):
+            obj = LTIStateSpaceMPCPyomoOptimization(
+                **self._fresh_specs(solver="gurobi_persistent")
             )
+        self.assertIs(obj.solver, solver, "solver should come from SolverFactory.")
+        solver.set_instance.assert_called_once_with(obj.model)
+
+        for _ in range(2):
+            obj.solve_model({"price": self.reward}, [50.0, 0.0])
+        self.assertEqual(solver.set_instance.call_count, 1, "model set more than once.")
+        solver.solve.assert_called_with(obj.model, warmstart=True)
+        self.assertEqual(solver.solve.call_count, 2)
+        solver.set_objective.assert_called_with(obj.model.objective)
+        self.assertEqual(solver.set_objective.call_count, 2)
+
+        # each solve removes and re-adds the t0 state constraints, in that order
+        t0_calls = [
+            call
+            for call in solver.method_calls
+            if call[0] in ("remove_constraint", "add_constraint")
+        ]
+        expected = []
+        for i in obj.model.xi:
+            con = obj.model.state[i, obj.model.t.first()]
+            expected += [
+                mock.call.remove_constraint(con),
+                mock.call.add_constraint(con),
+            ]
+        self.assertEqual(t0_calls, expected * 2)
 
     def test_matrices_AssertionError(self):
         """
         Test that AssertionError is thrown when matrices specified incorrectly.
         """
 
-        specs_check = self.specs.copy()
         # check that if matrices is not a valid path AssertionError is thrown
-        specs_check["matrices"] = "taco"
+        specs_check = self._fresh_specs(matrices="taco")
         self.assertRaises(
             AssertionError,
             LTIStateSpaceMPCPyomoOptimization,
@@ -106,12 +211,103 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         )
 
         # check that if matrices is not .pkl or .xml AssertionError is thrown
-        specs_check["matrices"] = "__init__.py"
+        specs_check = self._fresh_specs(matrices="__init__.py")
         self.assertRaises(
             AssertionError,
             LTIStateSpaceMPCPyomoOptimization,
             **specs_check,
-            msg="LTIStateSpaceMPCPyomoOptimization should have AssertionError when matrices extension is not .pkl or .xml.",
+            msg="LTIStateSpaceMPCPyomoOptimization should have AssertionError when matrices extension is not .pkl, .npz or .xml.",
+        )
+
+    def test_matrices_copied(self):
+        """
+        Test that A, B, C are read-only copies and the loaded arrays stay writable.
+        """
+
+        loaded = {letter: getattr(self.obj, letter).copy() for letter in "ABC"}
+
+        def load(obj, matrices_path):
+            obj.A, obj.B, obj.C = loaded["A"], loaded["B"], loaded["C"]
+
+        with mock.patch.object(
+            LTIStateSpaceMPCPyomoOptimization, "load_state_space_matrices", load
+        ):
+            obj = LTIStateSpaceMPCPyomoOptimization(**self._fresh_specs())
+        for letter, array in loaded.items():
+            self.assertTrue(
+                array.flags.writeable, f"loaded {letter} was made read-only."
+            )
+            self.assertFalse(
+                getattr(obj, letter).flags.writeable, f"{letter} should be read-only."
+            )
+            self.assertFalse(np.shares_memory(getattr(obj, letter), array))
+
+    def test_npz_matrices(self):
+        """
+        Test that matrices stored as a NumPy .npz archive load the same as the .pkl file.
+        """
+
+        npz_path = generate_matrices_pkl_from_csv(os.path.join(self.tmp_dir, "ABC.npz"))
+        obj = LTIStateSpaceMPCPyomoOptimization(**self._fresh_specs(matrices=npz_path))
+        for letter in ["A", "B", "C"]:
+            np.testing.assert_array_equal(
+                getattr(obj, letter),
+                getattr(self.obj, letter),
+                err_msg=f"{letter} from .npz does not match .pkl.",
+            )
+
+    def test_xml_matrices_cache(self):
+        """
+        Test that matrices parsed from XML are cached as .npz and reloaded from it.
+        """
+
+        cache = self.specs2["matrices"] + ".npz"
+        if os.path.isfile(cache):
+            os.remove(cache)
+
+        # first load parses the XML and writes the cache
+        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs2)
+        self.assertTrue(os.path.isfile(cache), "XML matrices cache not written.")
+
+        # second load reads the cache
+        obj2 = LTIStateSpaceMPCPyomoOptimization(**self.specs2)
+        for letter in ["A", "B", "C"]:
+            np.testing.assert_array_equal(
+                getattr(obj, letter),
+                getattr(obj2, letter),
+                err_msg=f"cached {letter} does not match XML.",
+            )
+
+        os.remove(cache)
+
+    def test_xml_matrices_cache_stale(self):
+        """
+        Test that the XML matrices cache is not used when the XML is replaced by a file
+        with an older modification time.
+        """
+
+        xml_path = shutil.copy(
+            self.specs2["matrices"], os.path.join(self.tmp_dir, "old.xml")
+        )
+        specs = self._fresh_specs(matrices=xml_path)
+        obj = LTIStateSpaceMPCPyomoOptimization(**specs)
+        cache_mtime = os.stat(xml_path + ".npz").st_mtime_ns
+
+        # replace A with half its values and backdate the XML (as cp -p or tar would)
+        tree = ET.parse(xml_path)
+        real = tree.getroot().find(".//Atilde").find(".//real")
+        real.text = " ".join(
+            str(0.5 * v) for v in np.fromstring(real.text, sep=" ", dtype=np.float64)
+        )
+        tree.write(xml_path)
+        old = cache_mtime - 10**10
+        os.utime(xml_path, ns=(old, old))
+
+        obj2 = LTIStateSpaceMPCPyomoOptimization(**specs)
+        np.testing.assert_allclose(
+            obj2.A,
+            0.5 * obj.A,
+            err_msg="stale XML matrices cache used for a replaced XML file.",
         )
 
     def test_x_bounds(self):
@@ -119,7 +315,7 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of x_bounds.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
+        obj = self.obj
         for i in range(2):
             x_bound = obj.x_bounds(None, i, 10)
             self.assertEqual(
@@ -133,7 +329,7 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of u_bounds.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
+        obj = self.obj
         for i in range(2):
             u_bound = obj.u_bounds(None, i, 10)
             self.assertEqual(
@@ -147,7 +343,7 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of y_bounds.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
+        obj = self.obj
         y_bound = obj.y_bounds(None, 0, 10)
         self.assertEqual(
             y_bound,
@@ -160,7 +356,7 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of initialize_reward.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
+        obj = self.obj
         self.assertEqual(
             0.0,
             obj.initialize_reward(None, 0, 10),
@@ -172,15 +368,8 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of solve_model.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
-        specs_reward = {
-            "history": os.path.join(
-                os.path.dirname(__file__), "..", "data", "storage_data.csv"
-            ),
-            "name": "LMP",
-        }
-        rewards = StaticHistoricalForecast(**specs_reward)
-        results = obj.solve_model({"price": rewards.gen_reward()}, [50.0, 0.0])
+        obj = self.obj
+        results = obj.solve_model({"price": self.reward}, [50.0, 0.0])
 
         self.assertEqual(
             results.solver.status,
@@ -198,22 +387,8 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
         Test functionality of return_next_dispatch.
         """
 
-        obj = LTIStateSpaceMPCPyomoOptimization(**self.specs)
-        specs_reward = {
-            "history": os.path.join(
-                os.path.dirname(__file__), "..", "data", "storage_data.csv"
-            ),
-            "name": "LMP",
-        }
-        rewards = StaticHistoricalForecast(**specs_reward)
-
-        next_dispatch = obj.return_next_dispatch(
-            {"price": rewards.gen_reward()}, [50.0, 0.0]
-        )
-        history_path = os.path.join(
-            os.path.dirname(__file__), "..", "data", "storage_data.csv"
-        )
-        vals = pd.read_csv(history_path)
+        obj = self.obj
+        next_dispatch = obj.return_next_dispatch({"price": self.reward}, [50.0, 0.0])
         needed_keys = ["states", "control", "measurements"]
         for key in needed_keys:
             self.assertTrue(
@@ -229,8 +404,57 @@ class TestLTIStateSpaceMPCPyomoOptimization(unittest.TestCase):
                 len(self.specs[key]["order"]),
                 f"{key} in next_dispatch for LTIStateSpaceMPCPyomoOptimization returns wrong number of entries.",
             )
-            # check that values are close to what they should be
-            for i in range(len(self.specs[key]["order"])):
-                self.assertAlmostEqual(
-                    next_dispatch[key][i], vals[self.specs[key]["order"][i]].values[1]
-                )
+            # check that values are close to what they should be (to 7 decimal places)
+            np.testing.assert_allclose(
+                np.asarray(next_dispatch[key], dtype=np.float64),
+                self.expected[self.specs[key]["order"]].to_numpy(dtype=np.float64),
+                rtol=0.0,
+                atol=5e-8,
+                err_msg=f"{key} in next_dispatch for LTIStateSpaceMPCPyomoOptimization has wrong values.",
+            )
+
+    def test_missing_measurement_multiplier(self):
+        """
+        Test that a model with measurements but no measurement_multiplier builds and
+        solves as if the measurement multiplier were zero.
+        """
+
+        specs = self._fresh_specs()
+        specs["objective"]["price"].pop("measurement_multiplier")
+        obj = LTIStateSpaceMPCPyomoOptimization(**specs)
+
+        next_dispatch = obj.return_next_dispatch({"price": self.reward}, [50.0, 0.0])
+        # measurement_multiplier is [0.0] in the shared specs
+        expected = self.obj.return_next_dispatch({"price": self.reward}, [50.0, 0.0])
+        self.assertAlmostEqual(
+            pyo.value(obj.model.objective),
+            pyo.value(self.obj.model.objective),
+            msg="LTIStateSpaceMPCPyomoOptimization objective changed without measurement_multiplier.",
+        )
+        for key in ["states", "control", "measurements"]:
+            self.assertEqual(
+                len(next_dispatch[key]),
+                len(expected[key]),
+                f"{key} in next_dispatch has wrong number of entries without measurement_multiplier.",
+            )
+
+    def test_single_step_horizon(self):
+        """
+        Test that a one step time horizon can be built and solved, but has no next
+        dispatch to return.
+        """
+
+        obj = LTIStateSpaceMPCPyomoOptimization(**self._fresh_specs(t_window=5.0))
+        self.assertEqual(obj.n, 1, "time horizon should have one step.")
+        results = obj.solve_model({"price": self.reward}, [50.0, 0.0])
+        self.assertEqual(
+            results.solver.termination_condition,
+            TerminationCondition.optimal,
+            "LTIStateSpaceMPCPyomoOptimization termination condition not optimal for n == 1.",
+        )
+        self.assertRaises(
+            AssertionError,
+            obj.return_next_dispatch,
+            {"price": self.reward},
+            [50.0, 0.0],
+        )
@@ -1,13 +1,50 @@
 import unittest
+import copy
 import pkgutil
 import importlib
 import os
+import pickle
+import numpy as np
 from ORCA.Basic.Optimization import Optimization
 import ORCA.Optimization
 from ..data.SamplePKLFile import generate_matrices_pkl_from_csv
 from ORCA.RewardForecast.StaticHistoricalForecast import StaticHistoricalForecast
 
 
+def _discover_optimization():
+    """
+    Returns Optimization and the classes of all modules in the ORCA.Optimization package.
+    """
+
+    found = [Optimization]
+    for module_info in pkgutil.walk_packages(
+        ORCA.Optimization.__path__, ORCA.Optimization.__name__ + "."
+    ):
+        module_string = module_info.name
+        specific_class = module_string.split(".")[-1]
+        module = importlib.import_module(module_string)
+        found.append(getattr(module, specific_class))
+
+    return found
+
+
+# gather all Optimization objects (once per process)
+_ALL_OPTIMIZATION = _discover_optimization()
+
+# (attribute, type) pairs every Optimization object must have
+_REQUIRED_ATTRIBUTES = (
+    ("t_window", float),
+    ("dt", float),
+    ("n", int),
+    ("states", dict),
+    ("control", dict),
+    ("measurements", dict),
+    ("objective", dict),
+)
+# returned by getattr for missing attributes
+_MISSING = object()
+
+
 class TestOptimization(unittest.TestCase):
     """
     Global Optimization tests.
@@ -19,17 +56,12 @@ class TestOptimization(unittest.TestCase):
 
     """
 
-    def setUp(self):
-        # gather all Optimization objects
-        self.all_optimization = [Optimization]
-        # get all in Optimization directory
-        for module_info in pkgutil.walk_packages(
-            ORCA.Optimization.__path__, ORCA.Optimization.__name__ + "."
-        ):
-            module_string = module_info.name
-            specific_class = module_string.split(".")[-1]
-            module = importlib.import_module(module_string)
-            self.all_optimization.append(getattr(module, specific_class))
+    @classmethod
+    def setUpClass(cls):
+        # generate .pkl file for A, B, C matrices for LTIStateSpaceMPCPyomoOptimization
+        # (reused across runs while up to date, written atomically so test modules can
+        # run in parallel)
+        cls.pkl_path = generate_matrices_pkl_from_csv()
 
         # example optimization problem comes from storage_data.csv
         # states: qNPP (50.0), SOC (0.0, 20.0)
@@ -38,11 +70,9 @@ class TestOptimization(unittest.TestCase):
         # price: LMP
         # StaticHistoricalForecast will be used to generate reward data
 
-        # generate .pkl file for A, B, C matrices for LTIStateSpaceMPCPyomoOptimization
-        generate_matrices_pkl_from_csv()
-
-        # specs that will work for instantiation
-        self.specs = {
+        # specs that will work for instantiation (shared, tests that change specs
+        # use _fresh_specs)
+        cls.specs = {
             "t_window": 720.0,
             "dt": 5.0,
             "states": {"order": ["qNPP", "SOC"], "lb": [0.0, 0.0], "ub": [50.0, 20.0]},
@@ -57,43 +87,64 @@ class TestOptimization(unittest.TestCase):
                 },
             },
             # specs specific to LTIStateSpaceMPCPyomoOptimization
-            "solver": "glpk",
-            "matrices": os.path.join(
-                os.path.dirname(__file__), "..", "data", "ABC.pkl"
-            ),
+            "solver": "appsi_highs",
+            "matrices": cls.pkl_path,
         }
 
-    def tearDown(self):
-        os.remove(os.path.join(os.path.dirname(__file__), "..", "data", "ABC.pkl"))
+        # reward/price forecast shared (read-only) by all Optimization objects
+        forecast = StaticHistoricalForecast(
+            t_window=cls.specs["t_window"],
+            dt=cls.specs["dt"],
+            history=os.path.join(
+                os.path.dirname(__file__), "..", "data", "storage_data.csv"
+            ),
+            name="LMP",
+        )
+        cls.reward = forecast.gen_reward()
+        cls.reward.setflags(write=False)
+
+    def setUp(self):
+        # all Optimization objects
+        self.all_optimization = _ALL_OPTIMIZATION
+
+    def _fresh_specs(self, **overrides):
+        """
+        Returns a deep copy of the specs with top-level overrides applied.
+
+        Parameters
+        ----------
+        overrides : dict
+            spec entries to replace
+
+        Returns
+        -------
+        specs : dict
+            copy of specs that can be modified freely
+
+        """
+
+        specs = copy.deepcopy(self.specs)
+        specs.update(overrides)
+
+        return specs
 
     def test_instantiation(self):
         """
         Tests that Optimization objects instantiate and contain required attributes.
         """
 
-        required_attributes = [
-            "t_window",
-            "dt",
-            "n",
-            "states",
-            "control",
-            "measurements",
-            "objective",
-        ]
-        required_type = [float, float, int, dict, dict, dict, dict]
-
         for mod in self.all_optimization:
             obj = mod(**self.specs)
 
             # check that required attributes exist and are correct type
-            for att, typ in zip(required_attributes, required_type):
-                self.assertTrue(
-                    hasattr(obj, att),
+            for att, typ in _REQUIRED_ATTRIBUTES:
+                value = getattr(obj, att, _MISSING)
+                self.assertIsNot(
+                    value,
+                    _MISSING,
                     f"Required attribute {att} missing for {obj.__class__}",
                 )
-                self.assertTrue(
-                    isinstance(getattr(obj, att), typ), f"{att} should be {typ}"
-                )
+                self.assertIsInstance(value, typ, f"{att} should be {typ}")
 
             # check that n is calculated correctly
             self.assertEqual(
@@ -108,8 +159,7 @@ class TestOptimization(unittest.TestCase):
         """
 
         # t_window must be float, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check["t_window"] = "taco"
+        spec_check = self._fresh_specs(t_window="taco")
         for mod in self.all_optimization:
             self.assertRaises(
                 AssertionError,
@@ -124,8 +174,7 @@ class TestOptimization(unittest.TestCase):
         """
 
         # dt must be float, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check["dt"] = "taco"
+        spec_check = self._fresh_specs(dt="taco")
         for mod in self.all_optimization:
             self.assertRaises(
                 AssertionError,
@@ -147,85 +196,35 @@ class TestOptimization(unittest.TestCase):
 
         """
 
-        # key must be dict, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check[key] = []
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {key} is not dict.",
-            )
-
-        # dictionary must have keys: 'order', 'lb', 'ub', if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check[key] = {"order": [], "lb": []}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {key} is missing ub key.",
-            )
-        spec_check = self.specs.copy()
-        spec_check[key] = {"order": [], "ub": []}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {key} is missing lb key.",
-            )
-        spec_check = self.specs.copy()
-        spec_check[key] = {"lb": [], "ub": []}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {key} is missing order key.",
-            )
-
-        # states values must be lists, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check[key] = {"order": "taco", "lb": [], "ub": []}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when order is not list.",
-            )
-        spec_check = self.specs.copy()
-        spec_check[key] = {"order": [], "lb": "taco", "ub": []}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when lb is not list.",
-            )
-        spec_check = self.specs.copy()
-        spec_check[key] = {"order": [], "lb": [], "ub": "taco"}
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when ub is not list.",
-            )
-
-        # states values must all be same length lists
-        spec_check = self.specs.copy()
-        spec_check[key]["order"] = []
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {key} lists are not all same length.",
-            )
+        # (value of key, failure) pairs that must raise AssertionError
+        cases = [
+            # key must be dict
+            ([], f"{key} is not dict"),
+            # dictionary must have keys: 'order', 'lb', 'ub'
+            ({"order": [], "lb": []}, f"{key} is missing ub key"),
+            ({"order": [], "ub": []}, f"{key} is missing lb key"),
+            ({"lb": [], "ub": []}, f"{key} is missing order key"),
+            # values must be lists
+            ({"order": "taco", "lb": [], "ub": []}, "order is not list"),
+            ({"order": [], "lb": "taco", "ub": []}, "lb is not list"),
+            ({"order": [], "lb": [], "ub": "taco"}, "ub is not list"),
+            # values must all be same length lists, even when none are empty
+            (
+                {"order": ["a", "b"], "lb": [0.0], "ub": [1.0, 2.0]},
+                f"{key} lists are not all same length",
+            ),
+            (dict(self.specs[key], order=[]), f"{key} lists are not all same length"),
+        ]
+        for value, failure in cases:
+            with self.subTest(msg=failure):
+                spec_check = self._fresh_specs(**{key: value})
+                for mod in self.all_optimization:
+                    self.assertRaises(
+                        AssertionError,
+                        mod,
+                        **spec_check,
+                        msg=f"{mod} should have AssertionError when {failure}.",
+                    )
 
     def test_states_input(self):
         """
@@ -253,37 +252,31 @@ class TestOptimization(unittest.TestCase):
         Tests that Optimization input 'objective' checks are performed correctly.
         """
 
-        # objective must be dictionary, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check["objective"] = []
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when objective is not dict.",
-            )
-
-        # objective must have a sense key, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check["objective"].pop("sense")
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when objective dictionary is missing sense key.",
-            )
-        # sense must be minimize or maximize, if not, raise AssertionError
-        spec_check = self.specs.copy()
-        spec_check["objective"]["sense"] = "zero"
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when sense is not minimize or maximize.",
-            )
+        # (objective, failure) pairs that must raise AssertionError
+        cases = [
+            # objective must be dictionary
+            ([], "objective is not dict"),
+            # objective must have a sense key
+            (
+                {k: v for k, v in self.specs["objective"].items() if k != "sense"},
+                "objective dictionary is missing sense key",
+            ),
+            # sense must be minimize or maximize
+            (
+                dict(self.specs["objective"], sense="zero"),
+                "sense is not minimize or maximize",
+            ),
+        ]
+        for value, failure in cases:
+            with self.subTest(msg=failure):
+                spec_check = self._fresh_specs(objective=value)
+                for mod in self.all_optimization:
+                    self.assertRaises(
+                        AssertionError,
+                        mod,
+                        **spec_check,
+                        msg=f"{mod} should have AssertionError when {failure}.",
+                    )
 
         # for each reward dictionary, check that multipliers are correct
         self.multiplier_checks("state")
@@ -300,53 +293,110 @@ class TestOptimization(unittest.TestCase):
             name of multiplier to check
 
         """
-        # for each reward dictionary, check that multipliers are correct
-        spec_check = self.specs.copy()
-        spec_check["objective"]["price"].pop(f"{name}_multiplier")
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {name}_multiplier is missing.",
-            )
-        spec_check = self.specs.copy()
-        spec_check["objective"]["price"][f"{name}_multiplier"] = "taco"
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {name}_multiplier is not a list.",
-            )
-        spec_check = self.specs.copy()
-        spec_check["objective"]["price"][f"{name}_multiplier"] = [0.0] * 100
-        for mod in self.all_optimization:
-            self.assertRaises(
-                AssertionError,
-                mod,
-                **spec_check,
-                msg=f"{mod} should have AssertionError when {name}_multiplier list larger than {name}.",
-            )
+        # (multiplier, failure) pairs that must raise AssertionError, None removes it
+        # (measurement_multiplier is optional, so it may be missing)
+        cases = [
+            ("taco", f"{name}_multiplier is not a list"),
+            ([0.0] * 100, f"{name}_multiplier list larger than {name}"),
+        ]
+        if name != "measurement":
+            cases.append((None, f"{name}_multiplier is missing"))
+        for value, failure in cases:
+            with self.subTest(msg=failure):
+                spec_check = self._fresh_specs()
+                price = spec_check["objective"]["price"]
+                if value is None:
+                    price.pop(f"{name}_multiplier")
+                else:
+                    price[f"{name}_multiplier"] = value
+                for mod in self.all_optimization:
+                    self.assertRaises(
+                        AssertionError,
+                        mod,
+                        **spec_check,
+                        msg=f"{mod} should have AssertionError when {failure}.",
+                    )
+
+    def test_skip_validation(self):
+        """
+        Tests that setting ORCA_SKIP_VALIDATION skips input dictionary checks.
+        """
+
+        spec_check = self._fresh_specs(
+            objective=dict(self.specs["objective"], sense="zero")
+        )
+        os.environ["ORCA_SKIP_VALIDATION"] = "1"
+        try:
+            obj = Optimization(**spec_check)
+        finally:
+            del os.environ["ORCA_SKIP_VALIDATION"]
+        self.assertEqual(
+            obj.objective["sense"],
+            "zero",
+            "Optimization should not validate objective when ORCA_SKIP_VALIDATION is set.",
+        )
+        self.assertRaises(
+            AssertionError,
+            Optimization,
+            **spec_check,
+            msg="Optimization should have AssertionError when sense is not minimize or maximize.",
+        )
+
+    def test_evaluate_objective(self):
+        """
+        Tests Optimization evaluate_objective method.
+        """
+
+        obj = Optimization(**self.specs)
+        n = obj.n
+        rewards = {"price": np.linspace(1.0, 2.0, n)}
+        states = np.vstack((np.full(n, 50.0), np.linspace(0.0, 20.0, n)))
+        control = np.vstack((np.full(n, 1.0), np.full(n, 3.0)))
+        measurements = np.linspace(0.0, 20.0, n).reshape((1, -1))
+
+        # state_multiplier [1, 0], control_multiplier [-1, 1], measurement_multiplier [0]
+        expected = np.sum(rewards["price"] * (states[0] - control[0] + control[1]))
+        self.assertAlmostEqual(
+            obj.evaluate_objective(rewards, states, control, measurements),
+            expected,
+            msg="Optimization evaluate_objective returns incorrect value.",
+        )
+
+        # measurement_multiplier needs measurements, and shapes must match the specs
+        for args, failure in (
+            ((rewards, states, control), "measurements are missing"),
+            ((rewards, states[:, :-1], control, measurements), "states is too short"),
+            ((rewards, states, control[:1], measurements), "control is missing a row"),
+            ((rewards, states, control, measurements.T), "measurements is transposed"),
+        ):
+            with self.subTest(msg=failure):
+                self.assertRaises(
+                    AssertionError,
+                    obj.evaluate_objective,
+                    *args,
+                )
+
+    def test_pickle(self):
+        """
+        Tests that Optimization objects survive a pickle round trip (e.g. process pools).
+        """
+
+        obj = pickle.loads(pickle.dumps(Optimization(**self.specs)))
+        self.assertEqual(
+            obj.return_next_dispatch({"price": self.reward}, [50.0, 0.0]),
+            {"states": [50.0, 0.0], "control": [0.0, 0.0], "measurements": [0.0]},
+            "Optimization return_next_dispatch incorrect after pickle round trip.",
+        )
 
     def test_return_next_dispatch(self):
         """
         Tests Optimization return_next_dispatch method.
         """
 
-        # use a StaticHistoricalForecast
-        forecast_spec = {
-            "t_window": self.specs["t_window"],
-            "dt": self.specs["dt"],
-            "history": os.path.join(
-                os.path.dirname(__file__), "..", "data", "storage_data.csv"
-            ),
-            "name": "LMP",
-        }
-        forecast = StaticHistoricalForecast(**forecast_spec)
+        # use the StaticHistoricalForecast reward/price from setUpClass
+        rewards = {"price": self.reward}
         for mod in self.all_optimization:
             obj = mod(**self.specs)
-            rewards = {"price": forecast.gen_reward()}
             x_init = [50.0, 0.0]
             next_dispatch = obj.return_next_dispatch(rewards, x_init)
 
@@ -7,6 +7,32 @@ from ORCA.Basic.RewardForecast import RewardForecast
 import ORCA.RewardForecast
 
 
+def _discover_reward_forecasts():
+    """
+    Returns RewardForecast and the classes of all modules in the ORCA.RewardForecast package.
+    """
+
+    found = [RewardForecast]
+    for module_info in pkgutil.walk_packages(
+        ORCA.RewardForecast.__path__, ORCA.RewardForecast.__name__ + "."
+    ):
+        module_string = module_info.name
+        specific_class = module_string.split(".")[-1]
+        module = importlib.import_module(module_string)
+        found.append(getattr(module, specific_class))
+
+    return found
+
+
+# gather all RewardForecast objects (once per process)
+_ALL_REWARD_FORECASTS = _discover_reward_forecasts()
+
+# (attribute, type) pairs every RewardForecast object must have
+_REQUIRED_ATTRIBUTES = (("t_window", float), ("dt", float), ("n", int), ("i", int))
+# returned by getattr for missing attributes
+_MISSING = object()
+
+
 class TestRewardForecast(unittest.TestCase):
     """
     Global RewardForecast tests.
@@ -41,36 +67,26 @@ class TestRewardForecast(unittest.TestCase):
         self.specs_failure2 = self.specs.copy()
         self.specs_failure2["dt"] = 1
 
-        self.all_reward_forecasts = [RewardForecast]
-        # get all belonging to the RewardForecast directory
-        for module_info in pkgutil.walk_packages(
-            ORCA.RewardForecast.__path__, ORCA.RewardForecast.__name__ + "."
-        ):
-            module_string = module_info.name
-            specific_class = module_string.split(".")[-1]
-            module = importlib.import_module(module_string)
-            self.all_reward_forecasts.append(getattr(module, specific_class))
+        # all RewardForecast objects
+        self.all_reward_forecasts = _ALL_REWARD_FORECASTS
 
     def test_instantiation(self):
         """
         Tests that the RewardForecast object is instantiated and contains required attributes.
         """
 
-        required_attributes = ["t_window", "dt", "n", "i"]
-        required_type = [float, float, int, int]
-
         for mod in self.all_reward_forecasts:
             obj = mod(**self.specs)
 
             # check that required attributes exist and are correct type
-            for att, typ in zip(required_attributes, required_type):
-                self.assertTrue(
-                    hasattr(obj, att),
+            for att, typ in _REQUIRED_ATTRIBUTES:
+                value = getattr(obj, att, _MISSING)
+                self.assertIsNot(
+                    value,
+                    _MISSING,
                     f"Required attribute {att} missing for {obj.__class__}",
                 )
-                self.assertTrue(
-                    isinstance(getattr(obj, att), typ), f"{att} should be {typ}"
-                )
+                self.assertIsInstance(value, typ, f"{att} should be {typ}")
 
             # check that n is calculated correctly
             self.assertEqual(
@@ -122,6 +138,30 @@ class TestRewardForecast(unittest.TestCase):
                     f"{obj.__class__} gen_reward does not increment counter i correctly",
                 )
 
+    def test_gen_reward_into(self):
+        """
+        Tests that gen_reward_into() writes the same samples as gen_reward().
+        """
+
+        for mod in self.all_reward_forecasts:
+            obj = mod(**self.specs)
+            obj_into = mod(**self.specs)
+            out = np.empty(obj_into.n)
+
+            for i in range(2):
+                reward = obj.gen_reward()
+                obj_into.gen_reward_into(out)
+                np.testing.assert_array_equal(
+                    out,
+                    reward,
+                    f"{obj.__class__} gen_reward_into does not match gen_reward",
+                )
+                self.assertEqual(
+                    i + 1,
+                    obj_into.i,
+                    f"{obj.__class__} gen_reward_into does not increment counter i correctly",
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -48,86 +48,139 @@ class TestSinusoidalForecast(unittest.TestCase):
                 isinstance(getattr(obj, att), typ), f"{att} should be {typ}"
             )
 
-    def test_amplitude_AssertionError(self):
+    def test_attribute_AssertionErrors(self):
         """
-        Tests that an AssertionError is thrown when amplitude is specified incorrectly.
+        Tests that an AssertionError is thrown when amplitude, phase, frequency, or offset
+        is specified incorrectly.
         """
 
-        self.assertRaises(
-            AssertionError,
-            SinusoidalForecast,
-            **self.specs_fail1,
-            msg="SinusoidalForecast should have AssertionError when 'amplitude' is not float.",
-        )
+        for specs, attr in (
+            (self.specs_fail1, "amplitude"),
+            (self.specs_fail2, "phase"),
+            (self.specs_fail3, "frequency"),
+            (self.specs_fail4, "offset"),
+        ):
+            with self.subTest(attr=attr):
+                self.assertRaises(
+                    AssertionError,
+                    SinusoidalForecast,
+                    **specs,
+                    msg=f"SinusoidalForecast should have AssertionError when '{attr}' is not float.",
+                )
 
-    def test_phase_AssertionError(self):
+    def test_SinusoidalForecast_gen_reward(self):
         """
-        Tests that an AssertionError is thrown when phase is specified incorrectly.
+        Tests that SinusoidalForecast gen_reward functions correctly.
         """
 
-        self.assertRaises(
-            AssertionError,
-            SinusoidalForecast,
-            **self.specs_fail2,
-            msg="SinusoidalForecast should have AssertionError when 'phase' is not float.",
+        obj = SinusoidalForecast(**self.specs_gen_reward)
+        # reference values for every call, each call should return a window of these
+        specs = self.specs_gen_reward
+        x = np.arange(obj.n + 1)
+        ref = specs["offset"] + specs["amplitude"] * np.sin(
+            specs["frequency"] * x + specs["phase"]
         )
-
-    def test_frequency_AssertionError(self):
+        for i in range(2):
+            with self.subTest(i=i):
+                reward = obj.gen_reward()
+                # check that gen_reward returns the correct type and length
+                self.assertTrue(
+                    isinstance(reward, np.ndarray),
+                    "SinusoidalForecast gen_reward must return numpy.ndarray.",
+                )
+                self.assertEqual(
+                    len(reward),
+                    obj.n,
+                    "SinusoidalForecast gen_reward must return numpy.ndarray of length n.",
+                )
+                # check that the values are correct
+                np.testing.assert_array_equal(
+                    reward,
+                    ref[i : i + obj.n],
+                    err_msg="SinusoidalForecast gen_reward calculated incorrectly.",
+                )
+                # check that counter i is incremented
+                self.assertEqual(
+                    i + 1,
+                    obj.i,
+                    "SinusoidalForecast does not increment counter i correctly.",
+                )
+
+    def test_SinusoidalForecast_gen_reward_aperiodic(self):
         """
-        Tests that an AssertionError is thrown when frequency is specified incorrectly.
+        Tests that SinusoidalForecast gen_reward is correct when the period is not a
+        whole number of samples.
         """
 
-        self.assertRaises(
-            AssertionError,
-            SinusoidalForecast,
-            **self.specs_fail3,
-            msg="SinusoidalForecast should have AssertionError when 'frequency' is not float.",
+        specs = dict(self.specs_gen_reward, frequency=0.3)
+        obj = SinusoidalForecast(**specs)
+        x = np.arange(obj.n + 2)
+        ref = specs["offset"] + specs["amplitude"] * np.sin(
+            specs["frequency"] * x + specs["phase"]
         )
-
-    def test_offset_AssertionError(self):
+        for i in range(3):
+            with self.subTest(i=i):
+                np.testing.assert_allclose(
+                    obj.gen_reward(),
+                    ref[i : i + obj.n],
+                    rtol=1e-12,
+                    atol=1e-12,
+                    err_msg="SinusoidalForecast gen_reward calculated incorrectly.",
+                )
+
+    def test_SinusoidalForecast_gen_reward_large_i(self):
         """
-        Tests that an AssertionError is thrown when offset is specified incorrectly.
+        Tests that SinusoidalForecast gen_reward stays correct far from i=0, for periodic
+        and nearly periodic sinusoids.
         """
 
-        self.assertRaises(
-            AssertionError,
-            SinusoidalForecast,
-            **self.specs_fail4,
-            msg="SinusoidalForecast should have AssertionError when 'offset' is not float.",
-        )
-
-    def test_SinusoidalForecast_gen_reward(self):
+        for frequency in (2.0 * np.pi / 144.0, 2.0 * np.pi / 288.0000001, 0.3):
+            with self.subTest(frequency=frequency):
+                specs = dict(self.specs_gen_reward, frequency=frequency)
+                obj = SinusoidalForecast(**specs)
+                obj.i = 20000
+                x = np.arange(obj.i, obj.i + obj.n)
+                correct_reward = specs["offset"] + specs["amplitude"] * np.sin(
+                    specs["frequency"] * x + specs["phase"]
+                )
+                np.testing.assert_allclose(
+                    obj.gen_reward(),
+                    correct_reward,
+                    rtol=0.0,
+                    atol=1e-10,
+                    err_msg="SinusoidalForecast gen_reward drifts at large i.",
+                )
+
+    def test_SinusoidalForecast_changed_attributes(self):
         """
-        Tests that SinusoidalForecast gen_reward functions correctly.
+        Tests that gen_reward uses amplitude, phase, frequency, offset, and n changed
+        after instantiation, for periodic (tabulated) and aperiodic (angle addition)
+        sinusoids.
         """
 
-        obj = SinusoidalForecast(**self.specs_gen_reward)
-        for i in range(2):
-            reward = obj.gen_reward()
-            # check that gen_reward returns the correct type and length
-            self.assertTrue(
-                isinstance(reward, np.ndarray),
-                "SinusoidalForecast gen_reward must return numpy.ndarray.",
-            )
-            self.assertEqual(
-                len(reward),
-                obj.n,
-                "SinusoidalForecast gen_reward must return numpy.ndarray of length n.",
-            )
-            # check that the values are correct
-            x = np.arange(i, i + obj.n)
-            correct_reward = self.specs_gen_reward["offset"] + self.specs_gen_reward[
-                "amplitude"
-            ] * np.sin(
-                self.specs_gen_reward["frequency"] * x + self.specs_gen_reward["phase"]
-            )
-            self.assertTrue(
-                all(correct_reward == reward),
-                "SinusoidalForecast gen_reward calculated incorrectly.",
-            )
-            # check that counter i is incremented
-            self.assertEqual(
-                i + 1,
-                obj.i,
-                "SinusoidalForecast does not increment counter i correctly.",
-            )
+        changes = {
+            "amplitude": 2.0,
+            "phase": 0.1,
+            "frequency": 0.3,
+            "offset": -1.0,
+            "n": 10,
+        }
+        for frequency in (2.0 * np.pi / 144.0, 0.3):
+            for attr, value in changes.items():
+                with self.subTest(frequency=frequency, attr=attr):
+                    obj = SinusoidalForecast(
+                        **dict(self.specs_gen_reward, frequency=frequency)
+                    )
+                    obj.gen_reward()
+                    setattr(obj, attr, value)
+                    x = np.arange(1, 1 + obj.n)
+                    correct_reward = obj.offset + obj.amplitude * np.sin(
+                        obj.frequency * x + obj.phase
+                    )
+                    np.testing.assert_allclose(
+                        obj.gen_reward(),
+                        correct_reward,
+                        rtol=1e-12,
+                        atol=1e-12,
+                        err_msg=f"SinusoidalForecast gen_reward ignores a change to {attr}.",
+                    )
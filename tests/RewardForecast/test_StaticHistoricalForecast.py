@@ -12,6 +12,15 @@ class TestStaticHistoricalForecast(unittest.TestCase):
     This tests instantiation and all other methods belonging to StaticHistoricalForecast.
     """
 
+    @classmethod
+    def setUpClass(cls):
+        # history values to check gen_reward against (read once, shared by all tests)
+        history_path = os.path.join(
+            os.path.dirname(__file__), "..", "data", "storage_data.csv"
+        )
+        cls.history = pd.read_csv(history_path, usecols=["LMP"])["LMP"].to_numpy()
+        cls.history.setflags(write=False)
+
     def setUp(self):
         # specs that cause AssertionError for history not str
         self.specs_fail1 = {"history": 1}
@@ -99,35 +108,35 @@ class TestStaticHistoricalForecast(unittest.TestCase):
         Tests that StaticHistoricalForecast gen_reward functions correctly.
         """
 
-        # history dataframe to check against
-        history = pd.read_csv(self.specs_good["history"])
+        # history values to check against
+        ref = self.history
 
         obj = StaticHistoricalForecast(**self.specs_good)
         for i in range(2):
-            # check that gen_reward returns correct type and length
-            reward = obj.gen_reward()
-            self.assertTrue(
-                isinstance(reward, np.ndarray),
-                "StaticHistoricalForecast gen_reward must return numpy.ndarray.",
-            )
-            self.assertEqual(
-                len(reward),
-                obj.n,
-                "StaticHistoricalForecast gen_reward must return numpy.ndarray of length n.",
-            )
-            # check that values are correct
-            end = i + obj.n
-            correct_reward = history[self.specs_good["name"]].values[i:end]
-            self.assertTrue(
-                all(correct_reward == reward),
-                "StaticHistoricalForecast gen_reward calculated incorrectly.",
-            )
-            # check that counter i is incremented
-            self.assertEqual(
-                i + 1,
-                obj.i,
-                "StaticHistoricalForecast does not increment counter i correctly.",
-            )
+            with self.subTest(i=i):
+                # check that gen_reward returns correct type and length
+                reward = obj.gen_reward()
+                self.assertTrue(
+                    isinstance(reward, np.ndarray),
+                    "StaticHistoricalForecast gen_reward must return numpy.ndarray.",
+                )
+                self.assertEqual(
+                    len(reward),
+                    obj.n,
+                    "StaticHistoricalForecast gen_reward must return numpy.ndarray of length n.",
+                )
+                # check that values are correct
+                np.testing.assert_array_equal(
+                    reward,
+                    ref[i : i + obj.n],
+                    err_msg="StaticHistoricalForecast gen_reward calculated incorrectly.",
+                )
+                # check that counter i is incremented
+                self.assertEqual(
+                    i + 1,
+                    obj.i,
+                    "StaticHistoricalForecast does not increment counter i correctly.",
+                )
 
         # check that a ValueError is raised if samples are requested beyond historical data
         obj.i = 10000
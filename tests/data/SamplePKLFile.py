@@ -5,7 +5,7 @@ import numpy.linalg as linalg
 import pandas as pd
 
 
-def generate_matrices_pkl_from_csv():
+def generate_matrices_pkl_from_csv(pkl_path=None):
     """
     Generates A, B, C matrices from data csv.
 
@@ -18,9 +18,29 @@ def generate_matrices_pkl_from_csv():
     The A, B, C matrices are found and stored in a dictionary that can be used by
     LTIStateSpaceMPCPyomoOptimization.
 
+    Parameters
+    ----------
+    pkl_path : str or None, optional
+        path of the pickle file to write (defaults to ABC.pkl next to this file), an
+        existing file newer than the data csv and this script is reused. Paths ending
+        in .npz are written as a NumPy archive instead of a pickle
+
+    Returns
+    -------
+    pkl_path : str
+        path of the written file
+
     """
 
     file_path = os.path.join(os.path.dirname(__file__), "storage_data.csv")
+    if pkl_path is None:
+        pkl_path = os.path.join(os.path.dirname(__file__), "ABC.pkl")
+    # skip the fit when the pickle is up to date with its inputs
+    if os.path.isfile(pkl_path) and os.path.getmtime(pkl_path) >= max(
+        os.path.getmtime(file_path), os.path.getmtime(__file__)
+    ):
+        return pkl_path
+
     # load data
     data_df = pd.read_csv(file_path)
 
@@ -31,21 +51,28 @@ def generate_matrices_pkl_from_csv():
     Xp = x[:, 1:]
     U = u[:, :-1]
     Om = np.vstack((X, U))
-    u, s, vh = linalg.svd(Om)
-    Sinv = np.diag(1.0 / s)
-    Sinv = np.hstack((Sinv, np.zeros((Om.shape[0], Om.shape[1] - Sinv.shape[1]))))
-    G = Xp.dot(vh.T.dot(Sinv.T).dot(u.T))
+    # least squares solution of G Om = Xp (economy decomposition, no full SVD)
+    G = linalg.lstsq(Om.T, Xp.T, rcond=None)[0].T
     A = G[:, : X.shape[0]]
     B = G[:, X.shape[0] :]
 
     # now find C
     y = data_df["SOC2"].values.reshape((1, -1))
-    C = y.dot(linalg.pinv(x))
+    C = linalg.lstsq(x.T, y.T, rcond=None)[0].T
 
     save_dict = {"A": A, "B": B, "C": C}
 
-    with open(os.path.join(os.path.dirname(__file__), "ABC.pkl"), "wb") as f:
-        pickle.dump(save_dict, f)
+    # write to a temporary file first so concurrent test processes never read a
+    # partially written pickle
+    tmp_path = f"{pkl_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        if pkl_path.lower().endswith(".npz"):
+            np.savez(f, **save_dict)
+        else:
+            pickle.dump(save_dict, f)
+    os.replace(tmp_path, pkl_path)
+
+    return pkl_path
 
 
 if __name__ == "__main__":
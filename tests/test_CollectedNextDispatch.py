@@ -1,14 +1,28 @@
 import unittest
 import os
+import shutil
+import tempfile
+from unittest import mock
 import yaml
-from yaml import Loader
+import numpy as np
 import pandas as pd
 from ORCA.Optimization.LTIStateSpaceMPCPyomoOptimization import (
     LTIStateSpaceMPCPyomoOptimization as LS,
 )
-from ORCA.CollectedNextDispatch import CollectedNextDispatch
+from ORCA.CollectedNextDispatch import (
+    CollectedNextDispatch,
+    RewardBundle,
+    _HistoryBuffer,
+    _read_spec,
+)
 from .data.SamplePKLFile import generate_matrices_pkl_from_csv
 
+try:
+    from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+except ImportError:
+    # libyaml C extension not available
+    from yaml import SafeLoader as Loader, SafeDumper as Dumper
+
 
 class TestORCA(unittest.TestCase):
     """
@@ -18,23 +32,31 @@ class TestORCA(unittest.TestCase):
 
     """
 
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         YAML_template_spec = os.path.join(
             os.path.dirname(__file__), "data", "test_template.yaml"
         )
-        # ensure ABC.pkl file is in YAMLspec
-        generate_matrices_pkl_from_csv()
+        # ensure ABC.pkl file is in YAMLspec (the spec is written once, to a private
+        # directory so test modules can run in parallel)
+        matrices_path = generate_matrices_pkl_from_csv()
+        cls.tmp_dir = tempfile.mkdtemp()
         with open(YAML_template_spec, "r") as f:
             tmp_spec = yaml.load(f, Loader=Loader)
-        matrices_path = os.path.join(os.path.dirname(__file__), "data", "ABC.pkl")
         tmp_spec["optimization"]["matrices"] = matrices_path
-        self.YAMLspec = os.path.join(os.path.dirname(__file__), "data", "test.yaml")
-        with open(self.YAMLspec, "w") as f:
-            yaml.dump(tmp_spec, f)
+        cls.YAMLspec = os.path.join(cls.tmp_dir, "test.yaml")
+        with open(cls.YAMLspec, "w") as f:
+            yaml.dump(tmp_spec, f, Dumper=Dumper)
 
-    def tearDown(self):
-        os.remove(os.path.join(os.path.dirname(__file__), "data", "test.yaml"))
-        os.remove(os.path.join(os.path.dirname(__file__), "data", "ABC.pkl"))
+        # object shared by all tests, reset before each one
+        cls.obj = CollectedNextDispatch(cls.YAMLspec)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def setUp(self):
+        self.obj.reset_objects()
 
     def test_instantiation(self):
         """
@@ -57,7 +79,7 @@ class TestORCA(unittest.TestCase):
             type(None),
         ]
 
-        obj = CollectedNextDispatch(self.YAMLspec)
+        obj = self.obj
         for att, typ in zip(required_attributes, required_type):
             self.assertTrue(
                 hasattr(obj, att), f"Required attribute {att} missing for ORCA."
@@ -72,7 +94,7 @@ class TestORCA(unittest.TestCase):
 
         """
 
-        obj = CollectedNextDispatch(self.YAMLspec)
+        obj = self.obj
         time = pd.to_datetime("2022-05-31 00:05:00")
         x_init = [50.0, 0.0]
         next_dispatch = obj.return_optimal_next_dispatch(time, x_init)
@@ -80,7 +102,8 @@ class TestORCA(unittest.TestCase):
         history_path = os.path.join(
             os.path.dirname(__file__), "data", "storage_data.csv"
         )
-        vals = pd.read_csv(history_path)
+        # only the row after the initial one is compared against
+        expected = pd.read_csv(history_path, nrows=2).iloc[1]
         needed_keys = ["states", "control", "measurements"]
         for key in needed_keys:
             self.assertTrue(
@@ -96,12 +119,72 @@ class TestORCA(unittest.TestCase):
                 len(obj.specs["optimization"][key]["order"]),
                 f"{key} in next_dispatch for ORCA returns wrong number of entries.",
             )
-            # check that values are close to what they should be
-            for i in range(len(obj.specs["optimization"][key]["order"])):
-                self.assertAlmostEqual(
-                    next_dispatch[key][i],
-                    vals[obj.specs["optimization"][key]["order"][i]].values[1],
-                )
+            # check that values are close to what they should be (to 7 decimal places)
+            np.testing.assert_allclose(
+                np.asarray(next_dispatch[key], dtype=np.float64),
+                expected[obj.specs["optimization"][key]["order"]].to_numpy(
+                    dtype=np.float64
+                ),
+                rtol=0.0,
+                atol=5e-8,
+                err_msg=f"{key} in next_dispatch for ORCA has wrong values.",
+            )
+
+    def test_return_optimal_next_dispatch_batch(self):
+        """
+        Test that return_optimal_next_dispatch_batch matches successive calls of
+        return_optimal_next_dispatch.
+
+        """
+
+        obj = self.obj
+        obj_batch = CollectedNextDispatch(self.YAMLspec)
+        times = list(pd.date_range("2022-05-31 00:05:00", periods=3, freq="5min"))
+        x_inits = [[50.0, 0.0], [50.0, 0.0], [50.0, 0.0]]
+
+        next_dispatch = [
+            obj.return_optimal_next_dispatch(time, x_init)
+            for time, x_init in zip(times, x_inits)
+        ]
+        next_dispatch_batch = obj_batch.return_optimal_next_dispatch_batch(
+            times, x_inits
+        )
+
+        for key in ["states", "control", "measurements"]:
+            np.testing.assert_allclose(
+                next_dispatch_batch[key],
+                [dispatch[key] for dispatch in next_dispatch],
+                err_msg=f"{key} from return_optimal_next_dispatch_batch do not match.",
+            )
+        pd.testing.assert_frame_equal(obj_batch.initial_states, obj.initial_states)
+        pd.testing.assert_frame_equal(obj_batch.optimal_results, obj.optimal_results)
+
+    def test_wrong_x_init(self):
+        """
+        Test that a wrong number of initial state values stores nothing.
+
+        """
+
+        obj = self.obj
+        time = pd.to_datetime("2022-05-31 00:05:00")
+        obj.return_optimal_next_dispatch(time, [50.0, 0.0])
+        initial_states = obj.initial_states.copy()
+        optimal_results = obj.optimal_results.copy()
+        counters = {key: obj.reward[key].i for key in obj.reward}
+
+        self.assertRaises(
+            AssertionError,
+            obj.return_optimal_next_dispatch,
+            time + obj._dt_delta,
+            [50.0],
+        )
+        pd.testing.assert_frame_equal(obj.initial_states, initial_states)
+        pd.testing.assert_frame_equal(obj.optimal_results, optimal_results)
+        self.assertEqual(
+            {key: obj.reward[key].i for key in obj.reward},
+            counters,
+            "reward forecasts advanced for a rejected time step.",
+        )
 
     def test_reset_objects(self):
         """
@@ -109,7 +192,7 @@ class TestORCA(unittest.TestCase):
 
         """
 
-        obj = CollectedNextDispatch(self.YAMLspec)
+        obj = self.obj
 
         # run return_optimal_next_dispatch to generate some results
         time = pd.to_datetime("2022-05-31 00:05:00")
@@ -134,3 +217,333 @@ class TestORCA(unittest.TestCase):
             obj.optimal_results is None,
             "ORCA reset_objects did not set optimal_results to None.",
         )
+
+
+class _InlineSpecTestCase(unittest.TestCase):
+    """
+    Base class for tests that write their own spec file (with measurements and two
+    reward/price forecasts) to a private directory.
+
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        history_path = os.path.join(
+            os.path.dirname(__file__), "data", "storage_data.csv"
+        )
+        multipliers = {
+            "state_multiplier": [1.0, 0.0],
+            "control_multiplier": [-1.0, 1.0],
+            "measurement_multiplier": [0.0],
+        }
+        cls.spec = {
+            "t_window": 720.0,
+            "dt": 5.0,
+            "optimization": {
+                "type": "LTIStateSpaceMPCPyomoOptimization",
+                "solver": "appsi_highs",
+                "matrices": generate_matrices_pkl_from_csv(),
+                "states": {
+                    "order": ["qNPP", "SOC"],
+                    "lb": [0.0, 0.0],
+                    "ub": [50.0, 20.0],
+                },
+                "control": {
+                    "order": ["qC", "qD"],
+                    "lb": [0.0, 0.0],
+                    "ub": [20.0, 20.0],
+                },
+                "measurements": {"order": ["SOC2"], "lb": [0.0], "ub": [20.0]},
+                "objective": {
+                    "sense": "maximize",
+                    "price": dict(multipliers),
+                    "wave": dict(multipliers),
+                },
+            },
+            "reward": {
+                "price": {
+                    "type": "StaticHistoricalForecast",
+                    "history": history_path,
+                    "name": "LMP",
+                },
+                "wave": {"type": "SinusoidalForecast", "amplitude": 5.0},
+            },
+            "parallel_rewards_threshold": 1,
+        }
+        cls.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def _write_spec(self, name, **overrides):
+        """
+        Writes the spec with top-level overrides applied and returns its path.
+
+        """
+
+        spec = dict(self.spec, **overrides)
+        spec_path = os.path.join(self.tmp_dir, f"{name}.yaml")
+        with open(spec_path, "w") as f:
+            yaml.dump(spec, f, Dumper=Dumper)
+
+        return spec_path
+
+
+class TestParallelRewards(_InlineSpecTestCase):
+    """
+    Tests for generating reward/price forecasts in a thread pool.
+
+    """
+
+    def test_matches_serial(self):
+        """
+        Test that forecasts generated in the thread pool match serial generation.
+
+        """
+
+        times = list(pd.date_range("2022-05-31 00:05:00", periods=3, freq="5min"))
+        x_inits = [[50.0, 0.0], [50.0, 0.0], [50.0, 0.0]]
+        with CollectedNextDispatch(
+            self._write_spec("parallel", parallel_rewards=True)
+        ) as obj, CollectedNextDispatch(self._write_spec("serial")) as obj_serial:
+            self.assertIsNotNone(obj._reward_pool, "thread pool was not started.")
+            self.assertIsNone(obj_serial._reward_pool, "thread pool should be off.")
+            for o in (obj, obj_serial):
+                o.return_optimal_next_dispatch(times[0], x_inits[0])
+                o.return_optimal_next_dispatch_batch(times[1:], x_inits[1:])
+            pd.testing.assert_frame_equal(
+                obj.optimal_results, obj_serial.optimal_results
+            )
+        self.assertIsNone(obj._reward_pool, "close did not shut down the thread pool.")
+
+    def test_exception_propagates(self):
+        """
+        Test that an exception raised while generating a forecast in the thread pool
+        reaches the caller.
+
+        """
+
+        with CollectedNextDispatch(
+            self._write_spec("parallel_error", parallel_rewards=True)
+        ) as obj:
+            obj.reward["price"].i = 100000
+            self.assertRaises(
+                ValueError,
+                obj.return_optimal_next_dispatch,
+                pd.to_datetime("2022-05-31 00:05:00"),
+                [50.0, 0.0],
+            )
+
+    def test_AssertionError(self):
+        """
+        Test that AssertionError is thrown when parallel_rewards or
+        parallel_rewards_threshold are specified incorrectly.
+
+        """
+
+        for name, overrides in (
+            ("parallel_rewards", {"parallel_rewards": "yes"}),
+            ("parallel_rewards_threshold", {"parallel_rewards_threshold": 1.0}),
+        ):
+            spec_path = self._write_spec(f"fail_{name}", **overrides)
+            with self.subTest(key=name), self.assertRaises(
+                AssertionError,
+                msg=f"CollectedNextDispatch should have AssertionError when {name} has the wrong type.",
+            ):
+                CollectedNextDispatch(spec_path)
+
+
+class TestBatch(_InlineSpecTestCase):
+    """
+    Tests for return_optimal_next_dispatch_batch.
+
+    """
+
+    def setUp(self):
+        self.times = list(pd.date_range("2022-05-31 00:05:00", periods=3, freq="5min"))
+        self.x_inits = [[50.0, 0.0], [50.0, 2.0], [50.0, 4.0]]
+
+    def test_matches_step_by_step(self):
+        """
+        Test that a batch matches successive calls of return_optimal_next_dispatch,
+        including measurements.
+
+        """
+
+        spec_path = self._write_spec("batch")
+        with CollectedNextDispatch(spec_path) as obj, CollectedNextDispatch(
+            spec_path
+        ) as obj_batch:
+            next_dispatch = [
+                obj.return_optimal_next_dispatch(time, x_init)
+                for time, x_init in zip(self.times, self.x_inits)
+            ]
+            next_dispatch_batch = obj_batch.return_optimal_next_dispatch_batch(
+                self.times, self.x_inits
+            )
+
+            for key in ["states", "control", "measurements"]:
+                np.testing.assert_allclose(
+                    next_dispatch_batch[key],
+                    [dispatch[key] for dispatch in next_dispatch],
+                    err_msg=f"{key} from return_optimal_next_dispatch_batch do not match.",
+                )
+            self.assertEqual(next_dispatch_batch["measurements"].shape, (3, 1))
+            pd.testing.assert_frame_equal(obj_batch.initial_states, obj.initial_states)
+            pd.testing.assert_frame_equal(
+                obj_batch.optimal_results, obj.optimal_results
+            )
+
+    def test_empty(self):
+        """
+        Test that an empty batch stores nothing and returns empty arrays.
+
+        """
+
+        with CollectedNextDispatch(self._write_spec("batch_empty")) as obj:
+            next_dispatch = obj.return_optimal_next_dispatch_batch([], [])
+            self.assertEqual(next_dispatch["states"].shape, (0, 2))
+            self.assertEqual(next_dispatch["control"].shape, (0, 2))
+            self.assertEqual(next_dispatch["measurements"].shape, (0, 1))
+            self.assertIsNone(obj.initial_states)
+            self.assertIsNone(obj.optimal_results)
+            for key in obj.reward:
+                self.assertEqual(obj.reward[key].i, 0)
+
+    def test_failure(self):
+        """
+        Test that a batch with a failing step stores nothing and restores the
+        RewardForecast counters.
+
+        """
+
+        with CollectedNextDispatch(self._write_spec("batch_failure")) as obj:
+            obj.return_optimal_next_dispatch(self.times[0], self.x_inits[0])
+            initial_states = obj.initial_states.copy()
+            optimal_results = obj.optimal_results.copy()
+            counters = {key: obj.reward[key].i for key in obj.reward}
+
+            solve = obj.optimization.return_next_dispatch
+            calls = []
+
+            def fail_second(rewards, x_init):
+                calls.append(x_init)
+                if len(calls) == 2:
+                    raise RuntimeError("solver failed")
+                return solve(rewards, x_init)
+
+            with mock.patch.object(
+                obj.optimization, "return_next_dispatch", side_effect=fail_second
+            ):
+                self.assertRaises(
+                    RuntimeError,
+                    obj.return_optimal_next_dispatch_batch,
+                    self.times[1:],
+                    self.x_inits[1:],
+                )
+            pd.testing.assert_frame_equal(obj.initial_states, initial_states)
+            pd.testing.assert_frame_equal(obj.optimal_results, optimal_results)
+            self.assertEqual(
+                {key: obj.reward[key].i for key in obj.reward},
+                counters,
+                "RewardForecast counters not restored after a failed batch.",
+            )
+
+
+class TestHistoryBuffer(unittest.TestCase):
+    """
+    _HistoryBuffer tests.
+
+    """
+
+    def test_add_rows(self):
+        """
+        Test that rows are stored, grow the buffer, and that rows with the wrong
+        number of values are not stored.
+
+        """
+
+        buffer = _HistoryBuffer(["a", "b"], capacity=1)
+        times = list(pd.date_range("2022-05-31 00:05:00", periods=3, freq="5min"))
+        buffer.add_row(times[0], [1.0, 2.0])
+        buffer.add_rows(times[1:], [[3.0, 4.0], [5.0, 6.0]])
+        expected = buffer.to_frame().copy()
+        np.testing.assert_array_equal(
+            expected[["a", "b"]].to_numpy(), [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+        )
+
+        for args, failure in (
+            ((times[0], [1.0]), "row is too short"),
+            ((times[0], 1.0), "row is a scalar"),
+        ):
+            with self.subTest(msg=failure):
+                self.assertRaises(AssertionError, buffer.add_row, *args)
+                pd.testing.assert_frame_equal(buffer.to_frame(), expected)
+        self.assertRaises(AssertionError, buffer.add_rows, times[:2], [[1.0, 2.0]])
+        pd.testing.assert_frame_equal(buffer.to_frame(), expected)
+
+
+class TestRewardBundle(unittest.TestCase):
+    """
+    RewardBundle tests.
+
+    """
+
+    def test_mapping(self):
+        """
+        Test that RewardBundle behaves as a dictionary of matrix rows.
+
+        """
+
+        matrix = np.arange(6.0).reshape((2, 3))
+        bundle = RewardBundle(["price", "demand"], matrix)
+
+        self.assertEqual(bundle.names, ("price", "demand"))
+        self.assertEqual(list(bundle), ["price", "demand"])
+        self.assertEqual(len(bundle), 2)
+        np.testing.assert_array_equal(bundle["demand"], matrix[1])
+        # rows are views so the bundle sees updates to the matrix
+        matrix[0, 0] = 10.0
+        self.assertEqual(bundle["price"][0], 10.0)
+        self.assertRaises(KeyError, bundle.__getitem__, "taco")
+
+
+class TestLoadSpec(unittest.TestCase):
+    """
+    Spec file cache tests.
+
+    """
+
+    def test_relative_paths(self):
+        """
+        Test that the same relative path in different directories is not shared by
+        the spec cache.
+
+        """
+
+        tmp_dir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        try:
+            for name, value in (("d1", 1), ("d2", 2)):
+                os.mkdir(os.path.join(tmp_dir, name))
+                with open(os.path.join(tmp_dir, name, "s.yaml"), "w") as f:
+                    f.write(f"a: {value}\n")
+            # identical modification times, as after cp -p
+            first = os.path.join(tmp_dir, "d1", "s.yaml")
+            stat = os.stat(first)
+            os.utime(
+                os.path.join(tmp_dir, "d2", "s.yaml"),
+                ns=(stat.st_atime_ns, stat.st_mtime_ns),
+            )
+
+            for name, value in (("d1", 1), ("d2", 2)):
+                os.chdir(os.path.join(tmp_dir, name))
+                self.assertEqual(
+                    _read_spec("s.yaml"),
+                    {"a": value},
+                    f"spec cache returned the wrong file for {name}/s.yaml.",
+                )
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(tmp_dir)